@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import iterate_in_threadpool
 from typing import AsyncIterator
+import asyncio
+import hashlib
 import json
 import logging
 
+import orjson
+
+from app.config import settings
 from app.database.connection import get_db
 from app.models.schemas import (
     QuestionRequest,
@@ -13,12 +19,46 @@ from app.models.schemas import (
     DocumentSummaryRequest,
     DocumentSummaryResponse
 )
+from app.services.cache import TTLCache
 from app.services.rag_service import rag_service
+from app.services.search import search_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Server-sent event framing
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+SSE_DONE = SSE_PREFIX + orjson.dumps({"type": "done"}) + SSE_SUFFIX
+
+# Cache of generated answers and summaries, keyed on the request parameters
+answer_cache = TTLCache(
+    maxsize=settings.answer_cache_size,
+    ttl=settings.answer_cache_ttl_seconds
+)
+
+
+def _cache_key(kind: str, **params) -> str:
+    """
+    Build a cache key for a request.
+
+    The corpus version is part of the key so uploads and deletes
+    invalidate previously cached answers.
+
+    Args:
+        kind: Endpoint-specific namespace
+        **params: Request parameters that affect the result
+
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps(
+        {"kind": kind, "version": search_service.corpus_version, **params},
+        sort_keys=True
+    )
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
 
 @router.post("/ask", response_model=QuestionResponse)
 async def ask_question(
@@ -40,8 +80,21 @@ async def ask_question(
     Returns:
         Answer with sources and metadata
     """
+    cache_key = _cache_key(
+        "ask",
+        q=request.question,
+        k=request.top_k,
+        sys=request.system_prompt,
+        u=request.user_id,
+        src=request.include_sources
+    )
+    cached = answer_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        result = rag_service.answer_question(
+        result = await asyncio.to_thread(
+            rag_service.answer_question,
             question=request.question,
             db=db,
             top_k=request.top_k,
@@ -50,7 +103,9 @@ async def ask_question(
             include_sources=request.include_sources
         )
 
-        return QuestionResponse(**result)
+        response = QuestionResponse(**result)
+        answer_cache.set(cache_key, response)
+        return response
 
     except Exception as e:
         logger.error(f"Error in ask endpoint: {str(e)}")
@@ -80,7 +135,8 @@ async def ask_question_stream(
     """
     try:
         # Get answer stream and sources
-        answer_stream, sources = rag_service.answer_question_stream(
+        answer_stream, sources = await asyncio.to_thread(
+            rag_service.answer_question_stream,
             question=request.question,
             db=db,
             top_k=request.top_k,
@@ -88,7 +144,7 @@ async def ask_question_stream(
             system_prompt=request.system_prompt
         )
 
-        async def generate_response() -> AsyncIterator[str]:
+        async def generate_response() -> AsyncIterator[bytes]:
             """Generate server-sent events with answer and sources."""
             # First, send sources
             sources_data = {
@@ -104,18 +160,16 @@ async def ask_question_stream(
                     for s in sources
                 ]
             }
-            yield f"data: {json.dumps(sources_data)}\n\n"
+            yield SSE_PREFIX + orjson.dumps(sources_data) + SSE_SUFFIX
 
-            # Then stream the answer
-            for chunk in answer_stream:
-                answer_data = {
-                    "type": "answer",
-                    "data": chunk
-                }
-                yield f"data: {json.dumps(answer_data)}\n\n"
+            # Then stream the answer, reusing one event dict for every chunk
+            answer_data = {"type": "answer", "data": None}
+            async for chunk in iterate_in_threadpool(answer_stream):
+                answer_data["data"] = chunk
+                yield SSE_PREFIX + orjson.dumps(answer_data) + SSE_SUFFIX
 
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield SSE_DONE
 
         return StreamingResponse(
             generate_response(),
@@ -152,6 +206,21 @@ async def conversation_qa(
     Returns:
         Answer with sources and metadata
     """
+    # Answers depend on the whole history, so only first turns are cached
+    cache_key = None
+    if not request.conversation_history:
+        cache_key = _cache_key(
+            "ask",
+            q=request.question,
+            k=request.top_k,
+            sys=None,
+            u=request.user_id,
+            src=True
+        )
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
         # Convert conversation history to format expected by LLM
         conversation_history = [
@@ -159,7 +228,8 @@ async def conversation_qa(
             for msg in request.conversation_history
         ]
 
-        result = rag_service.answer_question(
+        result = await asyncio.to_thread(
+            rag_service.answer_question,
             question=request.question,
             db=db,
             top_k=request.top_k,
@@ -168,7 +238,10 @@ async def conversation_qa(
             include_sources=True
         )
 
-        return QuestionResponse(**result)
+        response = QuestionResponse(**result)
+        if cache_key is not None:
+            answer_cache.set(cache_key, response)
+        return response
 
     except Exception as e:
         logger.error(f"Error in conversation endpoint: {str(e)}")
@@ -196,13 +269,20 @@ async def summarize_document(
     Returns:
         Document summary with metadata
     """
+    cache_key = _cache_key("summarize", doc=request.document_id)
+    cached = answer_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        result = rag_service.get_document_summary(
+        result = await rag_service.get_document_summary(
             document_id=request.document_id,
             db=db
         )
 
-        return DocumentSummaryResponse(**result)
+        response = DocumentSummaryResponse(**result)
+        answer_cache.set(cache_key, response)
+        return response
 
     except ValueError as e:
         raise HTTPException(
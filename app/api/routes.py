@@ -1,13 +1,18 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response, status
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
-from typing import List
-import shutil
+from typing import Any, Dict, Iterator, List
+import asyncio
+from itertools import islice
 from pathlib import Path
 import time
+import uuid
 
-from app.database.connection import get_db
+import orjson
+
+from app.database.connection import SessionLocal, get_db
 from app.database.models import Document, ContentChunk
-from app.database.vector_store import vector_store
+from app.database.vector_store import VectorStore, get_vector_store, user_key
 from app.models.schemas import (
     DocumentResponse,
     DocumentListResponse,
@@ -17,9 +22,10 @@ from app.models.schemas import (
     HealthResponse
 )
 from app.services.pdf_processor import pdf_processor
-from app.services.chunker import text_chunker
+from app.services.chunker import Chunk, text_chunker
 from app.services.embedder import embedding_service
 from app.services.search import search_service
+from app.services.cache import TTLCache
 from app.config import settings
 import logging
 
@@ -27,11 +33,57 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Read size for streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Chunks embedded and stored per pipeline step during upload
+UPLOAD_BATCH_CHUNKS = 512
+
+# Document and vector counts reported by the health check
+health_cache = TTLCache(maxsize=1, ttl=settings.health_cache_ttl_seconds)
+
+
+def _json_response(payload: Dict[str, Any]) -> Response:
+    """
+    Serialize a payload with orjson, skipping response-model validation.
+
+    Used by hot endpoints whose payloads are built from trusted data; the
+    schemas are still published in the OpenAPI docs via ``responses``.
+
+    Args:
+        payload: JSON-serializable payload
+
+    Returns:
+        JSON response
+    """
+    return Response(content=orjson.dumps(payload), media_type="application/json")
+
+
+def _take(chunks: Iterator[Chunk], n: int = UPLOAD_BATCH_CHUNKS) -> List[Chunk]:
+    """Pull the next n chunks from a chunk iterator."""
+    return list(islice(chunks, n))
+
+
+def _document_to_dict(document: Document) -> Dict[str, Any]:
+    """Convert a Document row to the DocumentResponse shape."""
+    return {
+        "id": document.id,
+        "title": document.title,
+        "user_id": document.user_id,
+        "file_path": document.file_path,
+        "file_size": document.file_size,
+        "page_count": document.page_count,
+        "content_hash": document.content_hash,
+        "created_at": document.created_at,
+        "doc_metadata": document.doc_metadata
+    }
+
 
 @router.post("/upload", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_pdf(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    vector_store: VectorStore = Depends(get_vector_store)
 ):
     """
     Upload and process a PDF file.
@@ -39,6 +91,7 @@ async def upload_pdf(
     Args:
         file: PDF file to upload
         db: Database session
+        vector_store: Vector store for chunk embeddings
 
     Returns:
         Upload response with document details
@@ -50,46 +103,61 @@ async def upload_pdf(
             detail="Only PDF files are supported"
         )
 
-    # Validate file size
-    file_content = await file.read()
-    file_size = len(file_content)
+    # Stream file to a temporary path, tracking size and content hash as we go
+    file_path = Path(settings.upload_dir) / file.filename
+    tmp_path = Path(settings.upload_dir) / f".{uuid.uuid4().hex}.part"
+    hasher = pdf_processor.new_content_hasher()
+    file_size = 0
+    too_large = False
 
-    if file_size > settings.max_file_size_bytes:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB"
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > settings.max_file_size_bytes:
+                    too_large = True
+                    break
+                hasher.update(chunk)
+                f.write(chunk)
+
+        if too_large:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB"
+            )
+
+        content_hash = hasher.hexdigest()
+
+        # Check for duplicates before doing any parsing
+        existing_id = await asyncio.to_thread(
+            db.scalar, select(Document.id).where(Document.content_hash == content_hash)
         )
+        if existing_id:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Document already exists with ID: {existing_id}"
+            )
 
-    # Save file temporarily
-    file_path = Path(settings.upload_dir) / file.filename
-    with open(file_path, "wb") as f:
-        f.write(file_content)
+        tmp_path.replace(file_path)
+    finally:
+        # Only left behind if the upload was rejected or failed
+        tmp_path.unlink(missing_ok=True)
+
+    document_id = None
 
     try:
         # Validate PDF
-        is_valid, error_msg = pdf_processor.validate_pdf(str(file_path))
+        is_valid, error_msg = await asyncio.to_thread(pdf_processor.validate_pdf, str(file_path))
         if not is_valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=error_msg
             )
 
-        # Calculate content hash
-        content_hash = pdf_processor.calculate_file_hash(str(file_path))
-
-        # Check for duplicates
-        existing_doc = db.query(Document).filter(Document.content_hash == content_hash).first()
-        if existing_doc:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Document already exists with ID: {existing_doc.id}"
-            )
-
         # Extract text and metadata
-        pages_data, pdf_metadata = pdf_processor.extract_text_with_pages(str(file_path))
-
-        # Get PDF info
-        pdf_info = pdf_processor.get_pdf_info(str(file_path))
+        pages_data, pdf_metadata = await asyncio.to_thread(
+            pdf_processor.extract_text_with_pages, str(file_path)
+        )
 
         # Extract title
         title = pdf_processor.extract_title_from_pdf(str(file_path), pdf_metadata)
@@ -99,79 +167,108 @@ async def upload_pdf(
             title=title,
             file_path=str(file_path),
             file_size=file_size,
-            page_count=pdf_info["page_count"],
+            page_count=pdf_metadata["total_pages"],
             content_hash=content_hash,
             doc_metadata=pdf_metadata
         )
         db.add(document)
-        db.flush()  # Get document ID
-
-        # Chunk the text
-        chunks = text_chunker.chunk_pages(pages_data)
-
-        # Generate embeddings
-        chunk_texts = [chunk["content"] for chunk in chunks]
-        embeddings = embedding_service.generate_embeddings_batch(chunk_texts)
-
-        # Prepare data for vector store
-        chunk_ids = []
-        chunk_metadatas = []
-        chunk_records = []
-
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{document.id}_chunk_{i}"
-            chunk_ids.append(chunk_id)
-
-            # Create chunk record
-            chunk_record = ContentChunk(
-                id=chunk_id,
-                document_id=document.id,
-                chunk_index=chunk["chunk_index"],
-                content=chunk["content"],
-                page_number=chunk.get("page_number"),
-                embedding_id=chunk_id,
-                chunk_metadata=chunk.get("metadata", {})
-            )
-            chunk_records.append(chunk_record)
-
-            # Prepare metadata for vector store
-            chunk_metadatas.append({
-                "document_id": document.id,
-                "user_id": document.user_id,
-                "chunk_index": chunk["chunk_index"],
-                "page_number": chunk.get("page_number"),
-                "title": document.title
-            })
-
-        # Store in vector database
-        vector_store.add_embeddings(
-            embeddings=embeddings,
-            documents=chunk_texts,
-            metadatas=chunk_metadatas,
-            ids=chunk_ids
-        )
-
-        # Store chunks in database
-        db.add_all(chunk_records)
-        db.commit()
-        db.refresh(document)
-
-        logger.info(f"Successfully processed document {document.id} with {len(chunks)} chunks")
+        await asyncio.to_thread(db.flush)  # Get document ID
+
+        document_id = document.id
+        document_user_key = user_key(document.user_id)
+        chunks_created = 0
+
+        # Pipeline: split the next batch of chunks in a worker thread while
+        # the current batch is embedded and stored
+        chunk_iter = text_chunker.iter_chunks(pages_data)
+        chunks = await asyncio.to_thread(_take, chunk_iter)
+        while chunks:
+            next_chunks = asyncio.create_task(asyncio.to_thread(_take, chunk_iter))
+            try:
+                # Generate embeddings
+                chunk_texts = [chunk.content for chunk in chunks]
+                embeddings = await embedding_service.agenerate_embeddings_batch(
+                    chunk_texts, token_counts=[chunk.token_count for chunk in chunks]
+                )
+
+                # Prepare data for vector store and database
+                chunk_ids = [f"{document_id}_chunk_{chunk.chunk_index}" for chunk in chunks]
+
+                # Rows for bulk insert
+                chunk_rows = [
+                    {
+                        "id": chunk_id,
+                        "document_id": document_id,
+                        "chunk_index": chunk.chunk_index,
+                        "content": chunk.content,
+                        "page_number": chunk.page_number,
+                        "embedding_id": chunk_id,
+                        "chunk_metadata": {
+                            "page_number": chunk.page_number,
+                            "char_count": chunk.char_count
+                        }
+                    }
+                    for chunk_id, chunk in zip(chunk_ids, chunks)
+                ]
+
+                # Vector metadata only carries the fields search filters on;
+                # titles and other document attributes are read from the database
+                chunk_metadatas = [
+                    {
+                        "document_id": document_id,
+                        "user_key": document_user_key,
+                        "chunk_index": chunk.chunk_index,
+                        "page_number": chunk.page_number
+                    }
+                    for chunk in chunks
+                ]
+
+                # Store in vector database
+                await asyncio.to_thread(
+                    vector_store.add_embeddings,
+                    embeddings=embeddings,
+                    documents=chunk_texts,
+                    metadatas=chunk_metadatas,
+                    ids=chunk_ids
+                )
+
+                # Store chunks in database with a single executemany INSERT
+                await asyncio.to_thread(db.execute, insert(ContentChunk), chunk_rows)
+            except BaseException:
+                # Let the chunking thread finish before unwinding
+                await asyncio.gather(next_chunks, return_exceptions=True)
+                raise
+
+            chunks_created += len(chunks)
+            chunks = await next_chunks
+
+        await asyncio.to_thread(db.commit)
+        await asyncio.to_thread(db.refresh, document)
+        search_service.bump_corpus_version()
+        health_cache.clear()
+
+        logger.info(f"Successfully processed document {document.id} with {chunks_created} chunks")
 
         return UploadResponse(
             document_id=document.id,
             title=document.title,
             page_count=document.page_count,
             file_size=document.file_size,
-            chunks_created=len(chunks),
+            chunks_created=chunks_created,
             message="PDF uploaded and processed successfully"
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await asyncio.to_thread(db.rollback)
         logger.error(f"Error processing PDF: {str(e)}")
+        # Earlier batches may already be in the vector store
+        if document_id is not None:
+            try:
+                await asyncio.to_thread(vector_store.delete_by_document_id, document_id)
+            except Exception as cleanup_error:
+                logger.error(f"Error removing partial embeddings: {str(cleanup_error)}")
         # Clean up file
         if file_path.exists():
             file_path.unlink()
@@ -181,7 +278,7 @@ async def upload_pdf(
         )
 
 
-@router.post("/query", response_model=QueryResponse)
+@router.post("/query", response_model=None, responses={200: {"model": QueryResponse}})
 async def query_documents(
     request: QueryRequest,
     db: Session = Depends(get_db)
@@ -200,24 +297,22 @@ async def query_documents(
 
     try:
         # Perform semantic search
-        results = search_service.semantic_search(
+        results = await asyncio.to_thread(
+            search_service.semantic_search,
             query=request.query,
             db=db,
             top_k=request.top_k,
             user_id=request.user_id
         )
 
-        # Re-rank results (currently pass-through)
-        results = search_service.rerank_results(results)
-
         processing_time = (time.time() - start_time) * 1000  # Convert to ms
 
-        return QueryResponse(
-            query=request.query,
-            results=results,
-            total_results=len(results),
-            processing_time_ms=round(processing_time, 2)
-        )
+        return _json_response({
+            "query": request.query,
+            "results": results,
+            "total_results": len(results),
+            "processing_time_ms": round(processing_time, 2)
+        })
 
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}")
@@ -227,8 +322,8 @@ async def query_documents(
         )
 
 
-@router.get("/documents", response_model=DocumentListResponse)
-async def list_documents(
+@router.get("/documents", response_model=None, responses={200: {"model": DocumentListResponse}})
+def list_documents(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db)
@@ -244,17 +339,29 @@ async def list_documents(
     Returns:
         List of documents
     """
-    documents = db.query(Document).offset(skip).limit(limit).all()
-    total = db.query(Document).count()
-
-    return DocumentListResponse(
-        documents=documents,
-        total=total
-    )
+    # Fetch the page and the total row count in a single query
+    rows = db.execute(
+        select(Document, func.count().over().label("total"))
+        .offset(skip)
+        .limit(limit)
+    ).all()
+
+    if rows:
+        total = rows[0].total
+    elif skip:
+        # A page past the end has no rows to carry the total
+        total = db.scalar(select(func.count()).select_from(Document))
+    else:
+        total = 0
+
+    return _json_response({
+        "documents": [_document_to_dict(row.Document) for row in rows],
+        "total": total
+    })
 
 
 @router.get("/documents/{document_id}", response_model=DocumentResponse)
-async def get_document(
+def get_document(
     document_id: str,
     db: Session = Depends(get_db)
 ):
@@ -280,9 +387,10 @@ async def get_document(
 
 
 @router.delete("/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_document(
+def delete_document(
     document_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    vector_store: VectorStore = Depends(get_vector_store)
 ):
     """
     Delete a document and all its chunks.
@@ -290,6 +398,7 @@ async def delete_document(
     Args:
         document_id: Document ID
         db: Database session
+        vector_store: Vector store for chunk embeddings
     """
     document = db.query(Document).filter(Document.id == document_id).first()
 
@@ -311,6 +420,8 @@ async def delete_document(
         # Delete from database (cascades to chunks)
         db.delete(document)
         db.commit()
+        search_service.bump_corpus_version()
+        health_cache.clear()
 
         logger.info(f"Successfully deleted document {document_id}")
 
@@ -323,29 +434,48 @@ async def delete_document(
         )
 
 
-@router.get("/health", response_model=HealthResponse)
-async def health_check(db: Session = Depends(get_db)):
+def _collect_health_stats(vector_store: VectorStore) -> Dict[str, Any]:
+    """
+    Count stored documents and vectors, and report embedding cache usage.
+
+    Args:
+        vector_store: Vector store to report on
+
+    Returns:
+        Dictionary with database_documents, vector_db_count and embedding_cache
+    """
+    db = SessionLocal()
+    try:
+        return {
+            "database_documents": db.scalar(select(func.count()).select_from(Document)),
+            "vector_db_count": vector_store.get_collection_stats()["count"],
+            "embedding_cache": embedding_service.get_cache_stats()
+        }
+    finally:
+        db.close()
+
+
+@router.get("/health", response_model=None, responses={200: {"model": HealthResponse}})
+async def health_check(vector_store: VectorStore = Depends(get_vector_store)):
     """
     Health check endpoint.
 
+    Cached counts are returned straight from the event loop; a database
+    session is only opened when the cache has expired.
+
     Args:
-        db: Database session
+        vector_store: Vector store to report on
 
     Returns:
         Health status
     """
     try:
-        # Check database
-        document_count = db.query(Document).count()
-
-        # Check vector store
-        vector_stats = vector_store.get_collection_stats()
+        stats = health_cache.get("stats")
+        if stats is None:
+            stats = await asyncio.to_thread(_collect_health_stats, vector_store)
+            health_cache.set("stats", stats)
 
-        return HealthResponse(
-            status="healthy",
-            vector_db_count=vector_stats["count"],
-            database_documents=document_count
-        )
+        return _json_response({"status": "healthy", **stats})
 
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
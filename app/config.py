@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from pathlib import Path
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -8,20 +10,51 @@ class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str
     embedding_model: str = "text-embedding-3-large"
+    embedding_dimensions: Optional[int] = None  # None keeps the model's native size
+    embedding_max_concurrency: int = 8
+    embedding_max_retries: int = 5
 
     # LLM Settings
     llm_model: str = "gpt-4-turbo-preview"
     llm_temperature: float = 0.7
     llm_max_tokens: int = 1500
 
+    # Caching
+    answer_cache_size: int = 10_000
+    answer_cache_ttl_seconds: int = 3600
+    semantic_cache_size: int = 1024
+    semantic_cache_threshold: float = 0.93
+    health_cache_ttl_seconds: int = 5
+    search_cache_size: int = 512
+    search_cache_ttl_seconds: int = 300
+    search_cache_threshold: float = 0.97
+    embedding_cache_path: Optional[str] = "./data/embedding_cache.db"  # None disables
+
     # Application
     max_file_size_mb: int = 50
     chunk_size: int = 500
     chunk_overlap: int = 50
+    chunking_strategy: Literal["recursive", "token"] = "recursive"
+
+    # Re-ranking (requires sentence-transformers)
+    rerank_model: Optional[str] = None  # e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidate_multiplier: int = 4
+    rerank_backend: Literal["torch", "onnx"] = "torch"
+    rerank_onnx_file: Optional[str] = None  # e.g. "onnx/model_qint8_avx512_vnni.onnx"
+    mmr_lambda: Optional[float] = None  # e.g. 0.7; diversifies results when no cross-encoder is set
+
+    # Retrieval results scoring below this never reach the LLM
+    min_relevance_for_llm: float = 0.3
 
     # Database
     database_url: str = "sqlite:///./data/sqlite.db"
     vector_db_path: str = "./data/chroma_db"
+    hnsw_m: int = 32
+    hnsw_construction_ef: int = 200
+    hnsw_search_ef: int = 64
+    db_pool_size: int = 25
+    db_max_overflow: int = 25
+    db_pool_recycle: int = 1800  # seconds
 
     # Storage
     upload_dir: str = "./data/uploads"
@@ -46,5 +79,12 @@ class Settings(BaseSettings):
         Path("data").mkdir(exist_ok=True)
 
 
-settings = Settings()
-settings.ensure_directories()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load settings once per process."""
+    loaded = Settings()
+    loaded.ensure_directories()
+    return loaded
+
+
+settings = get_settings()
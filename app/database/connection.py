@@ -1,15 +1,44 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, Session
 from app.config import settings
 from app.database.models import Base
 
 
-# Create database engine
+is_sqlite = "sqlite" in settings.database_url
+
+# Pool sizing only applies to QueuePool; in-memory SQLite uses a
+# SingletonThreadPool, which rejects these arguments
+database_url = make_url(settings.database_url)
+pool_kwargs = {}
+if issubclass(database_url.get_dialect().get_pool_class(database_url), QueuePool):
+    pool_kwargs = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+    }
+
+# Create database engine with a pooled, pre-pinged connection pool
 engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    database_url,
+    **pool_kwargs,
+    pool_pre_ping=True,
+    pool_recycle=settings.db_pool_recycle,
+    connect_args={"check_same_thread": False} if is_sqlite else {}
 )
 
+
+if is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Enable foreign keys, and WAL so readers don't block on the writer."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, String, Integer, Text, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -19,17 +19,24 @@ class Document(Base):
     __tablename__ = "documents"
 
     id = Column(String, primary_key=True, default=generate_uuid)
-    user_id = Column(String, default="default_user")  # For future multi-user support
+    user_id = Column(String, default="default_user", index=True)  # For future multi-user support
     title = Column(String(500), nullable=False)
     file_path = Column(Text, nullable=False)
     file_size = Column(Integer, nullable=False)
     page_count = Column(Integer, nullable=False)
-    content_hash = Column(String(64), unique=True, nullable=False)
+    content_hash = Column(String(32), unique=True, nullable=False)  # BLAKE2b-128 hex
     created_at = Column(DateTime, default=datetime.utcnow)
     doc_metadata = Column(JSON, default=dict)
 
-    # Relationship
-    chunks = relationship("ContentChunk", back_populates="document", cascade="all, delete-orphan")
+    # Relationship. Chunks are never loaded implicitly: deletes cascade in the
+    # database and reads should query ContentChunk directly.
+    chunks = relationship(
+        "ContentChunk",
+        back_populates="document",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise"
+    )
 
     def __repr__(self):
         return f"<Document(id={self.id}, title={self.title})>"
@@ -39,6 +46,10 @@ class ContentChunk(Base):
     """Content chunks table for storing processed text segments."""
 
     __tablename__ = "content_chunks"
+    __table_args__ = (
+        # Covers lookups by document and ordered scans by chunk_index
+        Index("ix_content_chunks_document_id_chunk_index", "document_id", "chunk_index"),
+    )
 
     id = Column(String, primary_key=True, default=generate_uuid)
     document_id = Column(String, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
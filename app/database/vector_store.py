@@ -1,30 +1,66 @@
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from app.config import settings
-from typing import List, Dict, Any, Optional
+from functools import cached_property, lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+import hashlib
+import numpy as np
+
+# Vectors rewritten per update call when backfilling metadata
+BACKFILL_BATCH_SIZE = 1000
+
+
+def user_key(user_id: str) -> int:
+    """
+    Map a user ID to the integer stored in vector metadata.
+
+    Chroma filters on integers faster than on strings. The key is a stable
+    63-bit BLAKE2b hash (Python's hash() changes between processes).
+
+    Args:
+        user_id: User ID
+
+    Returns:
+        Non-negative integer key
+    """
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
 
 
 class VectorStore:
     """Vector database wrapper using ChromaDB."""
 
     def __init__(self):
-        """Initialize ChromaDB client and collection."""
-        self.client = chromadb.Client(
+        """Initialize the vector store; the Chroma client opens on first use."""
+        self.collection_name = "second_brain_embeddings"
+
+    @cached_property
+    def client(self) -> chromadb.ClientAPI:
+        """ChromaDB client, created once."""
+        return chromadb.Client(
             ChromaSettings(
                 persist_directory=settings.vector_db_path,
                 anonymized_telemetry=False,
             )
         )
 
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="second_brain_embeddings",
-            metadata={"hnsw:space": "cosine"}
+    @cached_property
+    def collection(self) -> chromadb.Collection:
+        """Embeddings collection, created once."""
+        # HNSW parameters only take effect when the collection is first created
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": settings.hnsw_m,
+                "hnsw:construction_ef": settings.hnsw_construction_ef,
+                "hnsw:search_ef": settings.hnsw_search_ef,
+            }
         )
 
     def add_embeddings(
         self,
-        embeddings: List[List[float]],
+        embeddings: np.ndarray,
         documents: List[str],
         metadatas: List[Dict[str, Any]],
         ids: List[str]
@@ -33,7 +69,7 @@ class VectorStore:
         Add embeddings to the vector store.
 
         Args:
-            embeddings: List of embedding vectors
+            embeddings: Float32 array of shape (n, dimensions)
             documents: List of text content
             metadatas: List of metadata dictionaries
             ids: List of unique identifiers
@@ -47,28 +83,83 @@ class VectorStore:
 
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         n_results: int = 10,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        include_embeddings: bool = False
     ) -> Dict[str, Any]:
         """
         Search for similar embeddings.
 
+        Several queries can be answered in one call by passing a 2-D array;
+        results then hold one list per query row.
+
         Args:
-            query_embedding: Query vector
+            query_embedding: 1-D float32 query vector, or array of shape (n, dimensions)
             n_results: Number of results to return
             filter_metadata: Optional metadata filter
+            include_embeddings: Whether to also return the stored vectors
 
         Returns:
             Search results with ids, documents, distances, and metadatas
+            (and embeddings, if requested)
         """
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+
+        # Hand Chroma one contiguous float32 block, never Python lists;
+        # a no-op for vectors that come from the embedding service
+        query_embeddings = np.ascontiguousarray(np.atleast_2d(query_embedding), dtype=np.float32)
+
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=n_results,
-            where=filter_metadata if filter_metadata else None
+            where=filter_metadata if filter_metadata else None,
+            include=include
         )
         return results
 
+    def has_embeddings(self, filter_metadata: Dict[str, Any]) -> bool:
+        """
+        Check whether any embedding matches a metadata filter.
+
+        A metadata lookup only; much cheaper than a similarity search.
+
+        Args:
+            filter_metadata: Metadata filter
+
+        Returns:
+            True if at least one embedding matches
+        """
+        results = self.collection.get(where=filter_metadata, limit=1, include=[])
+        return len(results["ids"]) > 0
+
+    def backfill_user_keys(self, user_ids: Iterable[str]) -> int:
+        """
+        Move vectors indexed with a user_id string over to user_key.
+
+        Vectors stored before user_key existed carry the raw user_id; until
+        they are converted, filtered search cannot find them. Converted
+        vectors drop user_id, so once done this is a single empty lookup
+        per user.
+
+        Args:
+            user_ids: Every user ID that may own vectors
+
+        Returns:
+            Number of vectors updated
+        """
+        updated = 0
+        for user_id in user_ids:
+            metadata = {"user_key": user_key(user_id), "user_id": None}  # None deletes the key
+            while ids := self.collection.get(
+                where={"user_id": user_id}, limit=BACKFILL_BATCH_SIZE, include=[]
+            )["ids"]:
+                self.collection.update(ids=ids, metadatas=[metadata] * len(ids))
+                updated += len(ids)
+        return updated
+
     def delete_by_document_id(self, document_id: str) -> None:
         """
         Delete all embeddings for a specific document.
@@ -89,5 +180,11 @@ class VectorStore:
         }
 
 
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """Get the process-wide vector store."""
+    return VectorStore()
+
+
 # Singleton instance
-vector_store = VectorStore()
+vector_store = get_vector_store()
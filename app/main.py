@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
 
 from app.api.routes import router
 from app.api.rag_routes import router as rag_router
-from app.database.connection import init_db
+from app.database.connection import SessionLocal, init_db
+from app.database.models import Document
+from app.database.vector_store import get_vector_store
+from app.services.pdf_processor import pdf_processor
+from app.services.rag_service import get_rag_service
 from app.config import settings
 
 # Configure logging
@@ -17,16 +25,40 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def backfill_vector_user_keys() -> None:
+    """Convert vectors indexed before user_key filtering so search can scope them."""
+    db = SessionLocal()
+    try:
+        user_ids = db.scalars(select(Document.user_id).distinct()).all()
+    finally:
+        db.close()
+
+    updated = get_vector_store().backfill_user_keys(user_ids)
+    if updated:
+        logger.info(f"Added user keys to {updated} legacy vectors")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events."""
     # Startup
     logger.info("Starting Second Brain API...")
+    # Blocking service calls are offloaded with asyncio.to_thread; size the
+    # pool for I/O-heavy work (OpenAI, Chroma, SQLite)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=min(32, 4 * (os.cpu_count() or 1)))
+    )
     init_db()
     logger.info("Database initialized")
+    # Open the vector store now so the first request doesn't pay for it
+    get_vector_store().collection
+    backfill_vector_user_keys()
+    get_rag_service()
+    logger.info("Vector store ready")
     yield
     # Shutdown
     logger.info("Shutting down Second Brain API...")
+    pdf_processor.shutdown()
 
 
 # Create FastAPI application
@@ -110,6 +110,7 @@ class HealthResponse(BaseModel):
     status: str
     vector_db_count: int
     database_documents: int
+    embedding_cache: Dict[str, Optional[int]] = {}
 
 
 # RAG/Q&A Schemas
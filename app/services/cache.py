@@ -0,0 +1,248 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import hashlib
+import sqlite3
+import time
+
+import numpy as np
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+            ttl: Time-to-live of each entry in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Get a value if present and not expired.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            Cached value or default
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache keyed by embedding similarity.
+
+    Entries live in a fixed-size ring buffer of L2-normalized vectors, so a
+    lookup is a single matrix-vector product. Each entry belongs to a
+    namespace; only entries from the same namespace can match.
+    """
+
+    def __init__(self, maxsize: int, threshold: float):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+            threshold: Minimum cosine similarity for a hit
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._embeddings: Optional[np.ndarray] = None
+        self._namespace_ids = np.zeros(maxsize, dtype=np.int64)
+        self._values: List[Any] = [None] * maxsize
+        self._next = 0
+        self._count = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    @staticmethod
+    def _namespace_id(namespace: str) -> int:
+        digest = hashlib.blake2b(namespace.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    def get(self, embedding, namespace: str = "") -> Any:
+        """
+        Find the value stored for the most similar embedding.
+
+        Args:
+            embedding: Query embedding
+            namespace: Namespace the entry must belong to
+
+        Returns:
+            Cached value, or None if nothing is similar enough
+        """
+        query = self._normalize(embedding)
+        namespace_id = self._namespace_id(namespace)
+
+        with self._lock:
+            if not self._count or self._embeddings.shape[1] != query.shape[0]:
+                return None
+
+            scores = self._embeddings[:self._count] @ query
+            scores[self._namespace_ids[:self._count] != namespace_id] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._values[best]
+        return None
+
+    def set(self, embedding, value: Any, namespace: str = "") -> None:
+        """
+        Store a value, overwriting the oldest entry if full.
+
+        Args:
+            embedding: Embedding the value is keyed on
+            value: Value to store
+            namespace: Namespace of the entry
+        """
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            if self._embeddings is None or self._embeddings.shape[1] != vector.shape[0]:
+                self._embeddings = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+                self._next = 0
+                self._count = 0
+
+            slot = self._next
+            self._embeddings[slot] = vector
+            self._namespace_ids[slot] = self._namespace_id(namespace)
+            self._values[slot] = value
+            self._next = (slot + 1) % self.maxsize
+            self._count = min(self._count + 1, self.maxsize)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._values = [None] * self.maxsize
+            self._next = 0
+            self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class EmbeddingCache:
+    """
+    Persistent content-addressed store of embedding vectors.
+
+    Vectors are kept as raw float16 bytes in a SQLite table keyed by a
+    digest of the embedded text, so identical text is only ever sent to the
+    embedding API once. Half precision halves the footprint; callers still
+    get float32 vectors back.
+    """
+
+    # Stay well under SQLite's bound-parameter limit
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: str):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: SQLite database file
+        """
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings_f16 "
+            "(key BLOB PRIMARY KEY, vector BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._lock = Lock()
+        # Counted once here and kept up to date on insert, so reporting the
+        # size never scans the table
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings_f16").fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up several vectors at once.
+
+        Args:
+            keys: Cache keys
+
+        Returns:
+            Mapping of the keys that were found to their vectors
+        """
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(keys), self._QUERY_BATCH):
+                batch = keys[i:i + self._QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings_f16 WHERE key IN ({placeholders})",
+                    batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float16).astype(np.float32)
+        return found
+
+    def set_many(self, items: Iterable[Tuple[bytes, np.ndarray]]) -> None:
+        """
+        Store several vectors at once.
+
+        Args:
+            items: (key, vector) pairs
+        """
+        rows = [
+            (key, np.asarray(vector, dtype=np.float16).tobytes())
+            for key, vector in items
+        ]
+        with self._lock:
+            # Keys are content-addressed, so an existing row already holds
+            # the same vector; ignoring it keeps the row count exact
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings_f16 (key, vector) VALUES (?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._size += cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._size
@@ -1,11 +1,31 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 import tiktoken
 from app.config import settings
 import logging
+import os
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Loading an encoding is expensive; build it once per process and share it
+ENCODING = tiktoken.get_encoding("cl100k_base")  # OpenAI's encoding
+
+
+@dataclass(slots=True)
+class Chunk:
+    """A chunk of document text; far smaller than the equivalent nested dicts."""
+
+    content: str
+    chunk_index: int
+    token_count: int
+    page_number: Optional[int] = None
+    char_count: int = 0
+    metadata: Optional[Dict[str, Any]] = None
+
 
 class TextChunker:
     """Service for chunking text into semantic segments."""
@@ -14,7 +34,11 @@ class TextChunker:
         """Initialize the text chunker with configuration."""
         self.chunk_size = settings.chunk_size
         self.chunk_overlap = settings.chunk_overlap
-        self.encoding = tiktoken.get_encoding("cl100k_base")  # OpenAI's encoding
+        self.strategy = settings.chunking_strategy
+        self.encoding = ENCODING
+        # The recursive splitter measures the same separators and short
+        # fragments over and over, so memoize per instance
+        self._token_length = lru_cache(maxsize=4096)(self._count_tokens)
 
         # Initialize LangChain text splitter
         self.splitter = RecursiveCharacterTextSplitter(
@@ -25,7 +49,7 @@ class TextChunker:
             keep_separator=True
         )
 
-    def _token_length(self, text: str) -> int:
+    def _count_tokens(self, text: str) -> int:
         """
         Calculate token length using tiktoken.
 
@@ -35,19 +59,68 @@ class TextChunker:
         Returns:
             Number of tokens
         """
-        return len(self.encoding.encode(text))
+        return len(self.encoding.encode_ordinary(text))
 
-    def chunk_pages(self, pages_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def token_counts(self, texts: List[str]) -> List[int]:
         """
-        Chunk text from pages while preserving page metadata.
+        Count tokens for many texts with one batched, multi-threaded encode.
 
         Args:
-            pages_data: List of page dictionaries with page_number and text
+            texts: Input texts
 
         Returns:
-            List of chunk dictionaries with content and metadata
+            Number of tokens per text
+        """
+        encoded = self.encoding.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)
+        return [len(tokens) for tokens in encoded]
+
+    def _split_texts(self, texts: List[str]) -> Tuple[List[List[str]], List[int]]:
+        """
+        Split texts into chunks using the configured strategy.
+
+        "recursive" splits on paragraph, line and sentence boundaries.
+        "token" encodes each text once and slides a fixed window of
+        chunk_size tokens (stepping chunk_size - chunk_overlap) over it,
+        which is much cheaper but ignores separators.
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Tuple of (chunk texts per input text, token count of every chunk in order)
+        """
+        if self.strategy == "token":
+            step = max(self.chunk_size - self.chunk_overlap, 1)
+            split, token_counts = [], []
+            encoded = self.encoding.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)
+            for ids in encoded:
+                # Stop before a trailing window that would hold only overlap
+                windows = [
+                    ids[i:i + self.chunk_size]
+                    for i in range(0, max(len(ids) - self.chunk_overlap, 1), step)
+                ] if ids else []
+                split.append(self.encoding.decode_batch(windows))
+                token_counts.extend(len(window) for window in windows)
+            return split, token_counts
+
+        split = [self.splitter.split_text(text) for text in texts]
+        # Count tokens for every final chunk in one batch
+        token_counts = self.token_counts([chunk for chunks in split for chunk in chunks])
+        return split, token_counts
+
+    def iter_chunks(self, pages_data: List[Dict[str, Any]]) -> Iterator[Chunk]:
+        """
+        Chunk text from pages lazily, one page at a time.
+
+        Lets callers start embedding the first chunks before later pages
+        are split, and avoids holding every chunk of a large PDF at once.
+
+        Args:
+            pages_data: List of page dictionaries with page_number and text
+
+        Yields:
+            Chunks in document order
         """
-        all_chunks = []
         chunk_index = 0
 
         for page_data in pages_data:
@@ -59,26 +132,34 @@ class TextChunker:
                 continue
 
             # Split the page text into chunks
-            text_chunks = self.splitter.split_text(page_text)
-
-            for chunk_text in text_chunks:
-                chunk = {
-                    "content": chunk_text,
-                    "chunk_index": chunk_index,
-                    "page_number": page_number,
-                    "token_count": self._token_length(chunk_text),
-                    "metadata": {
-                        "page_number": page_number,
-                        "char_count": len(chunk_text)
-                    }
-                }
-                all_chunks.append(chunk)
+            split, token_counts = self._split_texts([page_text])
+
+            for chunk_text, token_count in zip(split[0], token_counts):
+                yield Chunk(
+                    content=chunk_text,
+                    chunk_index=chunk_index,
+                    token_count=token_count,
+                    page_number=page_number,
+                    char_count=len(chunk_text)
+                )
                 chunk_index += 1
 
+    def chunk_pages(self, pages_data: List[Dict[str, Any]]) -> List[Chunk]:
+        """
+        Chunk text from pages while preserving page metadata.
+
+        Args:
+            pages_data: List of page dictionaries with page_number and text
+
+        Returns:
+            List of chunks
+        """
+        all_chunks = list(self.iter_chunks(pages_data))
+
         logger.info(f"Created {len(all_chunks)} chunks from {len(pages_data)} pages")
         return all_chunks
 
-    def chunk_text(self, text: str, metadata: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    def chunk_text(self, text: str, metadata: Dict[str, Any] = None) -> List[Chunk]:
         """
         Chunk plain text without page information.
 
@@ -87,29 +168,31 @@ class TextChunker:
             metadata: Optional metadata to attach to chunks
 
         Returns:
-            List of chunk dictionaries
+            List of chunks
         """
-        text_chunks = self.splitter.split_text(text)
+        split, token_counts = self._split_texts([text])
+        text_chunks = split[0]
         chunks = []
 
-        for i, chunk_text in enumerate(text_chunks):
-            chunk = {
-                "content": chunk_text,
-                "chunk_index": i,
-                "token_count": self._token_length(chunk_text),
-                "metadata": metadata or {}
-            }
+        for i, (chunk_text, token_count) in enumerate(zip(text_chunks, token_counts)):
+            chunk = Chunk(
+                content=chunk_text,
+                chunk_index=i,
+                token_count=token_count,
+                char_count=len(chunk_text),
+                metadata=metadata or {}
+            )
             chunks.append(chunk)
 
         logger.info(f"Created {len(chunks)} chunks from text")
         return chunks
 
-    def get_chunk_stats(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def get_chunk_stats(self, chunks: List[Chunk]) -> Dict[str, Any]:
         """
         Get statistics about chunks.
 
         Args:
-            chunks: List of chunk dictionaries
+            chunks: List of chunks
 
         Returns:
             Statistics dictionary
@@ -123,14 +206,16 @@ class TextChunker:
                 "max_tokens": 0
             }
 
-        token_counts = [c["token_count"] for c in chunks]
+        token_counts = np.fromiter(
+            (c.token_count for c in chunks), dtype=np.int64, count=len(chunks)
+        )
 
         return {
             "total_chunks": len(chunks),
-            "total_tokens": sum(token_counts),
-            "avg_tokens_per_chunk": sum(token_counts) / len(token_counts),
-            "min_tokens": min(token_counts),
-            "max_tokens": max(token_counts)
+            "total_tokens": int(token_counts.sum()),
+            "avg_tokens_per_chunk": float(token_counts.mean()),
+            "min_tokens": int(token_counts.min()),
+            "max_tokens": int(token_counts.max())
         }
 
 
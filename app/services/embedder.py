@@ -1,43 +1,238 @@
-from typing import List
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from openai import APIConnectionError, InternalServerError, RateLimitError
 from app.config import settings
+from app.services.cache import EmbeddingCache
+from app.services.openai_client import get_async_openai_client, get_openai_client
+from app.services.chunker import ENCODING
+from functools import lru_cache
+import asyncio
+import base64
+import hashlib
 import logging
+import random
+import time
+import weakref
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Total input tokens the embeddings API accepts in one request
+MAX_BATCH_TOKENS = 300_000
+
+# Single-text embeddings (mostly search queries) kept in memory
+QUERY_CACHE_SIZE = 2048
+
+# Transient failures worth retrying; APITimeoutError is an APIConnectionError
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
 
 class EmbeddingService:
     """Service for generating text embeddings using OpenAI."""
 
     def __init__(self):
         """Initialize the embedding service."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Rate limits and transient failures are retried here, per batch and
+        # honouring Retry-After, so the SDK's own retries are disabled to
+        # avoid multiplying attempts
+        self.client = get_openai_client().with_options(max_retries=0)
+        self.async_client = get_async_openai_client().with_options(max_retries=0)
         self.model = settings.embedding_model
-        self.embedding_dimensions = 3072  # text-embedding-3-large dimensions
+        # text-embedding-3 models can return shortened vectors; fewer
+        # dimensions means proportionally less index memory and bandwidth
+        self.embedding_dimensions = settings.embedding_dimensions or 3072
+        # Ask for raw base64 payloads so vectors decode straight into
+        # float32 arrays without a detour through Python floats
+        self.request_options = {"encoding_format": "base64"}
+        if settings.embedding_dimensions:
+            self.request_options["dimensions"] = settings.embedding_dimensions
+        self.max_concurrency = settings.embedding_max_concurrency
+        self.max_retries = settings.embedding_max_retries
+        # One semaphore per event loop, shared by every concurrent batch
+        # request on it; a semaphore cannot be used across loops
+        self._semaphores = weakref.WeakKeyDictionary()
+        self.cache = (
+            EmbeddingCache(settings.embedding_cache_path)
+            if settings.embedding_cache_path else None
+        )
+        # Vectors differ per model and output size, so both go into the key
+        self._cache_prefix = f"{self.model}:{self.embedding_dimensions}|"
+        # Repeated questions skip the API and the SQLite lookup entirely;
+        # the cache is per instance, so the model is fixed for every entry
+        self._embed_one = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._generate_embedding)
+
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Concurrency limit for the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _cache_key(self, text: str) -> bytes:
+        """Content-addressed cache key for a text."""
+        return hashlib.sha256(f"{self._cache_prefix}{text}".encode()).digest()
+
+    def _split_cached(self, texts: List[str]) -> Tuple[List[bytes], Dict[bytes, np.ndarray], List[int]]:
+        """
+        Partition texts into cache hits and misses.
+
+        Repeated texts are only listed as missing once.
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Tuple of (keys, cached vectors by key, indices still to embed)
+        """
+        keys = [self._cache_key(text) for text in texts]
+        cached = self.cache.get_many(list(set(keys))) if self.cache is not None else {}
+
+        missing = []
+        seen = set(cached)
+        for i, key in enumerate(keys):
+            if key not in seen:
+                seen.add(key)
+                missing.append(i)
+        return keys, cached, missing
+
+    def _merge_cached(
+        self,
+        keys: List[bytes],
+        cached: Dict[bytes, np.ndarray],
+        missing: List[int],
+        fresh: np.ndarray
+    ) -> np.ndarray:
+        """
+        Stitch cached and freshly generated vectors back into input order.
+
+        Fresh vectors are written to the cache.
+
+        Args:
+            keys: Cache keys for every input text
+            cached: Cached vectors by key
+            missing: Input indices that were embedded
+            fresh: Newly generated vectors, aligned with ``missing``
+
+        Returns:
+            Float32 array of shape (len(keys), dimensions)
+        """
+        if self.cache is not None and missing:
+            self.cache.set_many(zip((keys[i] for i in missing), fresh))
+
+        if len(missing) == len(keys):
+            return fresh
+
+        by_key = dict(cached)
+        by_key.update(zip((keys[i] for i in missing), fresh))
+        return np.stack([by_key[key] for key in keys])
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """
+        Work out how long to wait before retrying a failed request.
+
+        Honours the Retry-After header when present, otherwise backs off
+        exponentially. Jitter keeps concurrent batches from retrying in lockstep.
 
-    def generate_embedding(self, text: str) -> List[float]:
+        Args:
+            error: Retryable error raised by the client
+            attempt: Zero-based attempt number
+
+        Returns:
+            Delay in seconds
+        """
+        retry_after: Optional[float] = None
+        try:
+            retry_after = float(error.response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            pass
+
+        delay = retry_after if retry_after is not None else min(2 ** attempt, 30)
+        return delay + random.uniform(0, 0.5)
+
+    def _decode_embeddings(self, data) -> np.ndarray:
+        """
+        Decode base64 embedding payloads into an L2-normalized float32 matrix.
+
+        Args:
+            data: Embedding items from an API response
+
+        Returns:
+            Array of shape (len(data), dimensions)
+        """
+        if not data:
+            return np.empty((0, self.embedding_dimensions), dtype=np.float32)
+        embeddings = np.vstack([
+            np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32)
+            for item in data
+        ])
+        # Unit length makes cosine similarity a plain dot product and keeps
+        # the half-precision cache copy well inside float16 range
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+        return embeddings
+
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
 
+        Results are memoized in process; the returned array is shared
+        between callers and read-only.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Embedding vector as a 1-D float32 array
+        """
+        return self._embed_one(text)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics about the embedding caches.
+
+        Returns:
+            Statistics dictionary for the in-process and persistent caches
+        """
+        info = self._embed_one.cache_info()
+        return {
+            "memory_hits": info.hits,
+            "memory_misses": info.misses,
+            "memory_size": info.currsize,
+            "memory_maxsize": info.maxsize,
+            "persistent_size": len(self.cache) if self.cache is not None else 0
+        }
+
+    def _generate_embedding(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text, consulting the persistent cache.
+
         Args:
             text: Input text
 
         Returns:
-            Embedding vector as list of floats
+            Read-only embedding vector as a 1-D float32 array
         """
+        keys, cached, missing = self._split_cached([text])
+        if cached:
+            embedding = np.ascontiguousarray(cached[keys[0]], dtype=np.float32)
+            embedding.setflags(write=False)
+            return embedding
+
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            embedding = response.data[0].embedding
+            embedding = self._merge_cached(keys, cached, missing, self._embed_batch([text]))[0]
+            # Contiguous float32 reaches Chroma's distance kernels without a copy
+            embedding = np.ascontiguousarray(embedding, dtype=np.float32)
+            embedding.setflags(write=False)
             logger.debug(f"Generated embedding for text of length {len(text)}")
             return embedding
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
 
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> np.ndarray:
         """
         Generate embeddings for multiple texts in batches.
 
@@ -46,35 +241,205 @@ class EmbeddingService:
             batch_size: Number of texts to process per batch
 
         Returns:
-            List of embedding vectors
+            Float32 array of shape (len(texts), dimensions)
+        """
+        keys, cached, missing = self._split_cached(texts)
+        pending = [texts[i] for i in missing]
+        order, batches = self._plan_batches(pending, batch_size)
+
+        try:
+            # map() yields results in submission order
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                all_embeddings = list(executor.map(self._embed_batch, batches))
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {str(e)}")
+            raise
+
+        fresh = self._restore_order(order, self._concatenate(all_embeddings))
+        embeddings = self._merge_cached(keys, cached, missing, fresh)
+        logger.info(f"Generated {len(pending)} embeddings in {len(batches)} batches "
+                    f"({len(cached)} served from cache)")
+        return embeddings
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
         """
-        all_embeddings = []
+        Embed one batch, retrying rate limits and transient failures.
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        Args:
+            batch: Texts to embed in a single request
 
+        Returns:
+            Float32 array of shape (len(batch), dimensions)
+        """
+        for attempt in range(self.max_retries + 1):
             try:
                 response = self.client.embeddings.create(
                     model=self.model,
-                    input=batch
+                    input=batch,
+                    **self.request_options
+                )
+                return self._decode_embeddings(response.data)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def agenerate_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 96,
+        token_counts: Optional[List[int]] = None
+    ) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts, sending batches concurrently.
+
+        At most ``embedding_max_concurrency`` requests are in flight at once
+        on each event loop.
+
+        Args:
+            texts: List of input texts
+            batch_size: Number of texts to send per request
+            token_counts: Token count of each text, if the caller already knows it
+
+        Returns:
+            Float32 array of shape (len(texts), dimensions) in input order
+        """
+        keys, cached, missing = self._split_cached(texts)
+        pending = [texts[i] for i in missing]
+        pending_tokens = [token_counts[i] for i in missing] if token_counts is not None else None
+        order, batches = self._plan_batches(pending, batch_size, pending_tokens)
+
+        try:
+            # gather() returns results in submission order
+            all_embeddings = await asyncio.gather(*(
+                self._aembed_batch(batch) for batch in batches
+            ))
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {str(e)}")
+            raise
+
+        fresh = self._restore_order(order, self._concatenate(all_embeddings))
+        embeddings = self._merge_cached(keys, cached, missing, fresh)
+
+        logger.info(f"Generated {len(pending)} embeddings in {len(batches)} concurrent batches "
+                    f"({len(cached)} served from cache)")
+        return embeddings
+
+    async def _aembed_batch(self, batch: List[str]) -> np.ndarray:
+        """
+        Embed one batch asynchronously, retrying rate limits and transient failures.
+
+        Args:
+            batch: Texts to embed in a single request
+
+        Returns:
+            Float32 array of shape (len(batch), dimensions)
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._semaphore:
+                    response = await self.async_client.embeddings.create(
+                        model=self.model,
+                        input=batch,
+                        **self.request_options
+                    )
+                return self._decode_embeddings(response.data)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(e, attempt)
+                logger.warning(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                # Sleep outside the semaphore so other batches can proceed
+                await asyncio.sleep(delay)
+
+    def _plan_batches(
+        self,
+        texts: List[str],
+        batch_size: int,
+        token_counts: Optional[List[int]] = None
+    ) -> Tuple[np.ndarray, List[List[str]]]:
+        """
+        Pack texts into requests by token budget, longest first.
+
+        Sorting by length keeps similarly sized texts together, so requests
+        fill up to the token budget evenly instead of a few long texts
+        pushing an arbitrary slice over the limit.
+
+        Without ``token_counts``, texts are only tokenized when their UTF-8
+        sizes say a request could reach the budget; byte-level BPE never
+        produces more tokens than bytes, so otherwise the sizes are a safe bound.
+
+        Args:
+            texts: Texts to embed
+            batch_size: Maximum number of texts per request
+            token_counts: Token count of each text, if already known
+
+        Returns:
+            Tuple of (sort order, batches of texts in that order)
+        """
+        if token_counts is not None:
+            lengths = np.asarray(token_counts, dtype=np.int64)
+        else:
+            lengths = np.fromiter(
+                (len(text.encode()) for text in texts), dtype=np.int64, count=len(texts)
+            )
+            # The largest request possible is the batch_size longest texts
+            if np.sort(lengths)[-batch_size:].sum() > MAX_BATCH_TOKENS:
+                lengths = np.fromiter(
+                    (len(tokens) for tokens in ENCODING.encode_ordinary_batch(texts)),
+                    dtype=np.int64,
+                    count=len(texts)
                 )
-                batch_embeddings = [item.embedding for item in response.data]
-                all_embeddings.extend(batch_embeddings)
+        order = np.argsort(-lengths, kind="stable")
+
+        batches: List[List[str]] = []
+        current: List[str] = []
+        current_tokens = 0
+        for i in order:
+            if current and (len(current) == batch_size or current_tokens + lengths[i] > MAX_BATCH_TOKENS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(texts[i])
+            current_tokens += lengths[i]
+
+        if current:
+            batches.append(current)
+        return order, batches
 
-                logger.info(f"Generated embeddings for batch {i // batch_size + 1} "
-                           f"({len(batch)} texts)")
+    @staticmethod
+    def _restore_order(order: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Undo the sort applied by _plan_batches.
 
-            except Exception as e:
-                logger.error(f"Error generating batch embeddings: {str(e)}")
-                raise
+        Args:
+            order: Sort order returned by _plan_batches
+            embeddings: Embeddings in sorted order
 
-        logger.info(f"Generated {len(all_embeddings)} embeddings total")
-        return all_embeddings
+        Returns:
+            Embeddings in original order
+        """
+        restored = np.empty_like(embeddings)
+        restored[order] = embeddings
+        return restored
+
+    def _concatenate(self, arrays: List[np.ndarray]) -> np.ndarray:
+        """Stack per-batch arrays into one matrix."""
+        if not arrays:
+            return np.empty((0, self.embedding_dimensions), dtype=np.float32)
+        return np.concatenate(arrays)
 
     def get_embedding_dimensions(self) -> int:
         """Get the dimension size of embeddings."""
         return self.embedding_dimensions
 
 
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Get the process-wide embedding service."""
+    return EmbeddingService()
+
+
 # Singleton instance
-embedding_service = EmbeddingService()
+embedding_service = get_embedding_service()
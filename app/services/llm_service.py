@@ -1,17 +1,52 @@
 from typing import List, Dict, Any, Optional, Iterator
-from openai import OpenAI
 from app.config import settings
+from app.services.openai_client import get_async_openai_client, get_openai_client
+from app.services.chunker import ENCODING
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SYSTEM_PROMPT = """You are a helpful AI assistant that answers questions based on provided context from documents.
+
+Your role:
+1. Answer questions accurately using ONLY the information in the provided context
+2. If the context doesn't contain enough information to answer, say so clearly
+3. Cite sources by referencing document names and page numbers when possible
+4. Be concise but thorough
+5. If multiple documents discuss the topic, synthesize information from all relevant sources
+6. Use clear formatting with bullet points or numbered lists when appropriate
+
+Important guidelines:
+- Don't make up information not present in the context
+- Don't use external knowledge unless explicitly asked
+- Always cite your sources using the format: [DocumentName.pdf, p.X]
+- If uncertain, express your level of confidence
+- Maintain a professional and helpful tone"""
+
+# Prompt templates, bound once at import
+format_context_message = """Context from documents:
+{}""".format
+
+format_user_message = """Question: {}
+
+Please provide a comprehensive answer based on the context above. Remember to cite sources.""".format
+
+format_summary_instructions = (
+    "You are a helpful assistant that creates concise summaries. "
+    "Limit summaries to approximately {} words."
+).format
+
+format_summary_request = "Please summarize the following text:\n\n{}".format
+
 
 class LLMService:
     """Service for LLM-based question answering and text generation."""
 
     def __init__(self):
         """Initialize the LLM service."""
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        self.client = get_openai_client()
+        self.async_client = get_async_openai_client()
         self.model = settings.llm_model
         self.temperature = settings.llm_temperature
         self.max_tokens = settings.llm_max_tokens
@@ -36,32 +71,15 @@ class LLMService:
             Dictionary with answer and metadata
         """
         try:
-            # Build messages
-            messages = []
-
-            # Add system prompt
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            else:
-                messages.append({
-                    "role": "system",
-                    "content": self._get_default_system_prompt()
-                })
-
-            # Add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-
-            # Add current question with context
-            user_message = self._format_user_message(question, context)
-            messages.append({"role": "user", "content": user_message})
+            messages = self._build_messages(question, context, system_prompt, conversation_history)
 
             # Generate response
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=self.temperature,
-                max_tokens=self.max_tokens
+                max_tokens=self.max_tokens,
+                extra_body=self._prompt_cache_options(messages)
             )
 
             answer = response.choices[0].message.content
@@ -106,22 +124,7 @@ class LLMService:
             Chunks of the generated answer
         """
         try:
-            # Build messages
-            messages = []
-
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            else:
-                messages.append({
-                    "role": "system",
-                    "content": self._get_default_system_prompt()
-                })
-
-            if conversation_history:
-                messages.extend(conversation_history)
-
-            user_message = self._format_user_message(question, context)
-            messages.append({"role": "user", "content": user_message})
+            messages = self._build_messages(question, context, system_prompt, conversation_history)
 
             # Generate streaming response
             stream = self.client.chat.completions.create(
@@ -129,7 +132,8 @@ class LLMService:
                 messages=messages,
                 temperature=self.temperature,
                 max_tokens=self.max_tokens,
-                stream=True
+                stream=True,
+                extra_body=self._prompt_cache_options(messages)
             )
 
             for chunk in stream:
@@ -142,40 +146,81 @@ class LLMService:
 
     def _get_default_system_prompt(self) -> str:
         """Get the default system prompt for RAG."""
-        return """You are a helpful AI assistant that answers questions based on provided context from documents.
+        return DEFAULT_SYSTEM_PROMPT
 
-Your role:
-1. Answer questions accurately using ONLY the information in the provided context
-2. If the context doesn't contain enough information to answer, say so clearly
-3. Cite sources by referencing document names and page numbers when possible
-4. Be concise but thorough
-5. If multiple documents discuss the topic, synthesize information from all relevant sources
-6. Use clear formatting with bullet points or numbered lists when appropriate
+    def _build_messages(
+        self,
+        question: str,
+        context: str,
+        system_prompt: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Assemble the chat messages for a RAG answer.
 
-Important guidelines:
-- Don't make up information not present in the context
-- Don't use external knowledge unless explicitly asked
-- Always cite your sources using the format: [DocumentName.pdf, p.X]
-- If uncertain, express your level of confidence
-- Maintain a professional and helpful tone"""
+        The large, stable parts (system prompt, then retrieved context) come
+        first and the question comes last, so repeated questions over the
+        same context share a prompt prefix the API can cache. The context is
+        untrusted document text, so it goes in a user message rather than
+        carrying system authority.
+
+        Args:
+            question: User's question
+            context: Retrieved context from documents
+            system_prompt: Optional system prompt to guide the LLM
+            conversation_history: Optional conversation history
 
-    def _format_user_message(self, question: str, context: str) -> str:
+        Returns:
+            List of chat messages
         """
-        Format the user message with question and context.
+        messages = [
+            {"role": "system", "content": system_prompt or self._get_default_system_prompt()},
+            {"role": "user", "content": self._format_context_message(context)}
+        ]
+
+        # Add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
+
+        messages.append({"role": "user", "content": self._format_user_message(question)})
+        return messages
+
+    def _prompt_cache_options(self, messages: List[Dict[str, str]]) -> Dict[str, str]:
+        """
+        Route requests with the same prompt prefix to the same prompt cache.
+
+        Args:
+            messages: Chat messages; the first two hold the system prompt and context
+
+        Returns:
+            Extra request body fields
+        """
+        prefix = "\x00".join(message["content"] for message in messages[:2])
+        return {"prompt_cache_key": hashlib.sha256(prefix.encode()).hexdigest()}
+
+    def _format_context_message(self, context: str) -> str:
+        """
+        Format the retrieved context as its own message.
 
         Args:
-            question: User's question
             context: Retrieved context
 
         Returns:
             Formatted message string
         """
-        return f"""Context from documents:
-{context}
+        return format_context_message(context)
+
+    def _format_user_message(self, question: str) -> str:
+        """
+        Format the user message with the question.
 
-Question: {question}
+        Args:
+            question: User's question
 
-Please provide a comprehensive answer based on the context above. Remember to cite sources."""
+        Returns:
+            Formatted message string
+        """
+        return format_user_message(question)
 
     def summarize_text(self, text: str, max_length: int = 200) -> str:
         """
@@ -189,22 +234,11 @@ Please provide a comprehensive answer based on the context above. Remember to ci
             Summary text
         """
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": f"You are a helpful assistant that creates concise summaries. Limit summaries to approximately {max_length} words."
-                },
-                {
-                    "role": "user",
-                    "content": f"Please summarize the following text:\n\n{text}"
-                }
-            ]
-
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=messages,
+                messages=self._summary_messages(text, max_length),
                 temperature=0.3,
-                max_tokens=max_length * 2  # Rough token estimate
+                max_tokens=self._summary_token_budget(text, max_length)
             )
 
             return response.choices[0].message.content
@@ -213,6 +247,73 @@ Please provide a comprehensive answer based on the context above. Remember to ci
             logger.error(f"Error summarizing text: {str(e)}")
             raise
 
+    async def asummarize_text(self, text: str, max_length: int = 200) -> str:
+        """
+        Summarize a piece of text without blocking the event loop.
+
+        Args:
+            text: Text to summarize
+            max_length: Maximum length of summary in words
+
+        Returns:
+            Summary text
+        """
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._summary_messages(text, max_length),
+                temperature=0.3,
+                max_tokens=self._summary_token_budget(text, max_length)
+            )
+
+            return response.choices[0].message.content
+
+        except Exception as e:
+            logger.error(f"Error summarizing text: {str(e)}")
+            raise
+
+    def _summary_token_budget(self, text: str, max_length: int) -> int:
+        """
+        Estimate the completion tokens needed for a summary of max_length words.
+
+        Uses the tokens-per-word ratio of the source text, so languages and
+        jargon that tokenize densely aren't cut off mid-sentence.
+
+        Args:
+            text: Text being summarized
+            max_length: Maximum length of summary in words
+
+        Returns:
+            max_tokens value for the request
+        """
+        words = len(text.split())
+        tokens_per_word = len(ENCODING.encode_ordinary(text)) / words if words else 1.0
+        # Double the word limit, as before: the model treats it loosely, and a
+        # summary stopped at max_tokens ends mid-sentence
+        return max(64, int(max_length * max(tokens_per_word, 1.0) * 2))
+
+    def _summary_messages(self, text: str, max_length: int) -> List[Dict[str, str]]:
+        """
+        Build the chat messages for a summary request.
+
+        Args:
+            text: Text to summarize
+            max_length: Maximum length of summary in words
+
+        Returns:
+            List of chat messages
+        """
+        return [
+            {
+                "role": "system",
+                "content": format_summary_instructions(max_length)
+            },
+            {
+                "role": "user",
+                "content": format_summary_request(text)
+            }
+        ]
+
     def extract_keywords(self, text: str, num_keywords: int = 10) -> List[str]:
         """
         Extract key terms from text.
@@ -0,0 +1,27 @@
+from openai import OpenAI, AsyncOpenAI
+from app.config import settings
+from functools import lru_cache
+import httpx
+
+# One pool serves embeddings, chat and summaries; HTTP/2 multiplexes
+# concurrent requests over a few connections instead of a handshake each
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> OpenAI:
+    """Get the process-wide synchronous OpenAI client."""
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        http_client=httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get the process-wide asynchronous OpenAI client."""
+    return AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        http_client=httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    )
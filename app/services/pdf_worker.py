@@ -0,0 +1,62 @@
+"""
+Page text extraction, shared by PDFProcessor and its worker processes.
+
+Spawned workers import this module to unpickle the task, so it must not
+import the rest of the app (config, database, OpenAI clients, models).
+"""
+import pdfplumber
+import pypdfium2 as pdfium
+from threading import Lock
+from typing import List
+
+# PDFium is not thread-safe, so calls from this process are serialized;
+# worker processes each load their own copy
+PDFIUM_LOCK = Lock()
+
+
+def init_worker() -> None:
+    """
+    Pool initializer: load the PDF libraries before the first task.
+
+    Only the extraction dependencies are imported, so workers start without
+    the server's import graph.
+    """
+    import pdfplumber  # noqa: F401
+    import pypdfium2  # noqa: F401
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract text from pages ``start`` to ``stop - 1``.
+
+    Uses PDFium, which is much faster than pdfplumber's pure-Python layout
+    analysis; pages where PDFium finds no text are retried with pdfplumber.
+    Also runs in worker processes for parallel extraction.
+
+    Args:
+        file_path: Path to the PDF file
+        start: First page index (0-based)
+        stop: Page index to stop before
+
+    Returns:
+        Text of each page in order
+    """
+    texts = []
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for i in range(start, stop):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                texts.append(textpage.get_text_bounded().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+
+    empty = [i for i, text in enumerate(texts) if not text.strip()]
+    if empty:
+        with pdfplumber.open(file_path) as plumber_pdf:
+            for i in empty:
+                texts[i] = plumber_pdf.pages[start + i].extract_text() or ""
+    return texts
@@ -1,11 +1,30 @@
 from typing import List, Dict, Any, Optional, Iterator
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.services.cache import SemanticCache
 from app.services.search import search_service
 from app.services.llm_service import llm_service
+from app.services.chunker import text_chunker
+from functools import lru_cache
+import asyncio
+import json
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+# Token budget for the text sent in one summary request
+SUMMARY_GROUP_TOKENS = 6000
+# Concurrent summary requests per document
+SUMMARY_MAX_CONCURRENCY = 5
+
+# Returned instead of calling the LLM when retrieval finds nothing usable
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in your documents to answer this question."
+
+# Header and body of each retrieved chunk in the LLM context
+format_context_source = "[Source {}: {}, Page {}, Relevance: {:.2f}]\n{}\n".format
+
 
 class RAGService:
     """Service for Retrieval-Augmented Generation (RAG) Q&A."""
@@ -14,6 +33,11 @@ class RAGService:
         """Initialize the RAG service."""
         self.search_service = search_service
         self.llm_service = llm_service
+        # Answers keyed by question embedding, so paraphrases hit as well
+        self.semantic_cache = SemanticCache(
+            maxsize=settings.semantic_cache_size,
+            threshold=settings.semantic_cache_threshold
+        )
 
     def answer_question(
         self,
@@ -42,17 +66,38 @@ class RAGService:
         """
         logger.info(f"Processing question: {question}")
 
-        # Step 1: Retrieve relevant context
-        search_results = self.search_service.semantic_search(
-            query=question,
+        # Embed once; the vector serves both the cache lookup and retrieval
+        query_embedding = self.search_service.embedder.generate_embedding(question)
+
+        # Answers depend on the whole history, so only first turns are cached
+        cache_namespace = None
+        if not conversation_history:
+            cache_namespace = json.dumps([
+                top_k,
+                user_id,
+                system_prompt,
+                include_sources,
+                self.search_service.corpus_version
+            ])
+            cached = self.semantic_cache.get(query_embedding, cache_namespace)
+            if cached is not None:
+                logger.info("Returning semantically cached answer")
+                return cached
+
+        # Steps 1-2: Retrieve relevant context and build the prompt context
+        search_results, context_text, sources = self._retrieve_and_build(
+            question=question,
             db=db,
             top_k=top_k,
-            user_id=user_id
+            user_id=user_id,
+            include_sources=include_sources,
+            query_embedding=query_embedding
         )
 
-        if not search_results:
+        # Skip the LLM round-trip when nothing retrieved is relevant enough
+        if not self._has_relevant_context(search_results):
             return {
-                "answer": "I couldn't find any relevant information in your documents to answer this question.",
+                "answer": NO_CONTEXT_ANSWER,
                 "sources": [],
                 "context_used": 0,
                 "confidence": "none",
@@ -64,9 +109,6 @@ class RAGService:
                 }
             }
 
-        # Step 2: Build context from search results
-        context_text, sources = self._build_context(search_results)
-
         # Step 3: Generate answer using LLM
         llm_response = self.llm_service.generate_answer(
             question=question,
@@ -78,13 +120,16 @@ class RAGService:
         # Step 4: Prepare response
         response = {
             "answer": llm_response["answer"],
-            "sources": sources if include_sources else [],
+            "sources": sources,
             "context_used": len(search_results),
             "model": llm_response["model"],
             "usage": llm_response["usage"],
             "confidence": self._estimate_confidence(search_results)
         }
 
+        if cache_namespace is not None:
+            self.semantic_cache.set(query_embedding, response, cache_namespace)
+
         logger.info(f"Generated answer with {len(sources)} sources")
         return response
 
@@ -113,22 +158,20 @@ class RAGService:
         """
         logger.info(f"Processing streaming question: {question}")
 
-        # Retrieve relevant context
-        search_results = self.search_service.semantic_search(
-            query=question,
+        # Retrieve relevant context; skip re-ranking to keep time-to-first-token low
+        search_results, context_text, sources = self._retrieve_and_build(
+            question=question,
             db=db,
             top_k=top_k,
-            user_id=user_id
+            user_id=user_id,
+            rerank=False
         )
 
-        if not search_results:
+        if not self._has_relevant_context(search_results):
             def empty_stream():
-                yield "I couldn't find any relevant information in your documents to answer this question."
+                yield NO_CONTEXT_ANSWER
             return empty_stream(), []
 
-        # Build context
-        context_text, sources = self._build_context(search_results)
-
         # Generate streaming answer
         answer_stream = self.llm_service.generate_answer_stream(
             question=question,
@@ -139,48 +182,114 @@ class RAGService:
 
         return answer_stream, sources
 
+    def _retrieve_and_build(
+        self,
+        question: str,
+        db: Session,
+        top_k: int,
+        user_id: str,
+        include_sources: bool = True,
+        rerank: bool = True,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> tuple[List[Dict[str, Any]], str, List[Dict[str, Any]]]:
+        """
+        Retrieve context for a question and build the prompt context from it.
+
+        SearchService caches results per question and corpus version, so
+        asking again (streamed or not) skips embedding and retrieval.
+
+        Args:
+            question: User's question
+            db: Database session
+            top_k: Number of context chunks to retrieve
+            user_id: User ID for filtering
+            include_sources: Whether to build the source citations
+            rerank: Whether results should be re-ranked
+            query_embedding: Precomputed embedding of the question
+
+        Returns:
+            Tuple of (search_results, context_text, sources)
+        """
+        search_results = self.search_service.semantic_search(
+            query=question,
+            db=db,
+            top_k=top_k,
+            user_id=user_id,
+            query_embedding=query_embedding,
+            rerank=rerank
+        )
+
+        context_text, sources = self._build_context(search_results, include_sources)
+        return search_results, context_text, sources
+
     def _build_context(
         self,
-        search_results: List[Dict[str, Any]]
+        search_results: List[Dict[str, Any]],
+        include_sources: bool = True
     ) -> tuple[str, List[Dict[str, Any]]]:
         """
         Build context text and source citations from search results.
 
         Args:
             search_results: List of search result dictionaries
+            include_sources: Whether to build the source citations
 
         Returns:
-            Tuple of (context_text, sources)
+            Tuple of (context_text, sources); sources is empty when not requested
         """
-        context_parts = []
-        sources = []
-
-        for i, result in enumerate(search_results, 1):
-            # Format each chunk with metadata
-            doc_title = result["document_title"]
-            page_num = result.get("page_number", "N/A")
-            content = result["content"]
-            relevance = result["relevance_score"]
-
-            # Add to context
-            context_parts.append(
-                f"[Source {i}: {doc_title}, Page {page_num}, Relevance: {relevance:.2f}]\n{content}\n"
+        context_text = "\n---\n".join(
+            format_context_source(
+                i,
+                result["document_title"],
+                result.get("page_number", "N/A"),
+                result["relevance_score"],
+                result["content"]
             )
+            for i, result in enumerate(search_results, 1)
+        )
 
-            # Add to sources list
-            sources.append({
+        if not include_sources:
+            return context_text, []
+
+        sources = [
+            {
                 "source_id": i,
-                "document_title": doc_title,
-                "page_number": page_num,
-                "relevance_score": relevance,
+                "document_title": result["document_title"],
+                "page_number": result.get("page_number", "N/A"),
+                "relevance_score": result["relevance_score"],
                 "chunk_id": result["chunk_id"],
                 "document_id": result["document_id"],
-                "content_preview": content[:200] + "..." if len(content) > 200 else content
-            })
-
-        context_text = "\n---\n".join(context_parts)
+                "content_preview": (
+                    result["content"][:200] + "..."
+                    if len(result["content"]) > 200 else result["content"]
+                )
+            }
+            for i, result in enumerate(search_results, 1)
+        ]
         return context_text, sources
 
+    def _has_relevant_context(self, search_results: List[Dict[str, Any]]) -> bool:
+        """
+        Check whether any result is relevant enough to be worth an LLM call.
+
+        Re-ranking may reorder results, so the best vector score is used
+        rather than the first result's.
+
+        Args:
+            search_results: Search results
+
+        Returns:
+            True if the best relevance score meets settings.min_relevance_for_llm
+        """
+        if not search_results:
+            return False
+
+        top_relevance = max(result["relevance_score"] for result in search_results)
+        if top_relevance < settings.min_relevance_for_llm:
+            logger.info(f"Top relevance {top_relevance:.2f} below threshold, skipping LLM")
+            return False
+        return True
+
     def _estimate_confidence(self, search_results: List[Dict[str, Any]]) -> str:
         """
         Estimate confidence level based on search results.
@@ -194,12 +303,12 @@ class RAGService:
         if not search_results:
             return "none"
 
-        # Check top result relevance
+        # Check top result relevance (cosine similarity)
         top_relevance = search_results[0]["relevance_score"]
 
-        if top_relevance >= 0.8:
+        if top_relevance >= 0.75:
             return "high"
-        elif top_relevance >= 0.6:
+        elif top_relevance >= 0.33:
             return "medium"
         else:
             return "low"
@@ -248,7 +357,7 @@ class RAGService:
 
         return answers
 
-    def get_document_summary(
+    async def get_document_summary(
         self,
         document_id: str,
         db: Session
@@ -256,6 +365,10 @@ class RAGService:
         """
         Generate a summary of a specific document.
 
+        The whole document is covered map-reduce style: groups of chunks are
+        summarized concurrently, then the partial summaries are summarized
+        (repeatedly, if they still don't fit in one request).
+
         Args:
             document_id: Document ID to summarize
             db: Database session
@@ -265,30 +378,78 @@ class RAGService:
         """
         from app.database.models import Document, ContentChunk
 
-        # Get document
-        document = db.query(Document).filter(Document.id == document_id).first()
+        def load():
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if not document:
+                return None, []
+            chunks = db.query(ContentChunk.content).filter(
+                ContentChunk.document_id == document_id
+            ).order_by(ContentChunk.chunk_index).all()
+            return document, [chunk.content for chunk in chunks]
+
+        # Get document and all of its chunk text
+        document, texts = await asyncio.to_thread(load)
         if not document:
             raise ValueError(f"Document {document_id} not found")
 
-        # Get all chunks for the document
-        chunks = db.query(ContentChunk).filter(
-            ContentChunk.document_id == document_id
-        ).order_by(ContentChunk.chunk_index).all()
+        semaphore = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+
+        async def summarize_group(group_text: str) -> str:
+            async with semaphore:
+                return await self.llm_service.asummarize_text(group_text, max_length=150)
 
-        # Combine chunk content (limit to avoid token overflow)
-        full_text = " ".join([chunk.content for chunk in chunks[:20]])  # First 20 chunks
+        # Map: summarize token-bounded groups until everything fits in one request
+        parts = texts
+        groups = self._group_by_tokens(parts)
+        while len(groups) > 1:
+            parts = await asyncio.gather(*(summarize_group(group) for group in groups))
+            groups = self._group_by_tokens(parts)
 
-        # Generate summary
-        summary = self.llm_service.summarize_text(full_text, max_length=300)
+        # Reduce: one final summary
+        summary = await self.llm_service.asummarize_text(
+            groups[0] if groups else "",
+            max_length=300
+        )
 
         return {
             "document_id": document_id,
             "document_title": document.title,
             "summary": summary,
             "page_count": document.page_count,
-            "chunks_analyzed": min(len(chunks), 20)
+            "chunks_analyzed": len(texts)
         }
 
+    def _group_by_tokens(self, texts: List[str]) -> List[str]:
+        """
+        Join consecutive texts into groups that fit the summary token budget.
+
+        Args:
+            texts: Texts in document order
+
+        Returns:
+            Joined text of each group
+        """
+        groups = []
+        current: List[str] = []
+        current_tokens = 0
+
+        for text, tokens in zip(texts, text_chunker.token_counts(texts)):
+            if current and current_tokens + tokens > SUMMARY_GROUP_TOKENS:
+                groups.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+
+        if current:
+            groups.append(" ".join(current))
+        return groups
+
+
+@lru_cache(maxsize=1)
+def get_rag_service() -> RAGService:
+    """Get the process-wide RAG service."""
+    return RAGService()
+
 
 # Singleton instance
-rag_service = RAGService()
+rag_service = get_rag_service()
@@ -1,10 +1,16 @@
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
-from app.database.vector_store import vector_store
-from app.database.models import ContentChunk, Document
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from app.config import settings
+from app.database.vector_store import user_key, vector_store
+from app.database.models import ContentChunk
+from app.services.cache import SemanticCache, TTLCache
 from app.services.embedder import embedding_service
+from threading import Lock
+import json
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,67 +21,332 @@ class SearchService:
         """Initialize the search service."""
         self.vector_store = vector_store
         self.embedder = embedding_service
+        # Bumped whenever documents are added or removed so caches built on
+        # top of search results can tell when they are stale
+        self.corpus_version = 0
+        # The re-ranking model is loaded on first use, not at import
+        self._cross_encoder = None
+        self._cross_encoder_loaded = False
+        self._cross_encoder_lock = Lock()
+        # Exact repeats skip embedding as well as the vector search;
+        # near-duplicate queries skip the vector search
+        self.query_cache = TTLCache(
+            maxsize=settings.search_cache_size,
+            ttl=settings.search_cache_ttl_seconds
+        )
+        self.semantic_cache = SemanticCache(
+            maxsize=settings.search_cache_size,
+            threshold=settings.search_cache_threshold
+        )
+        # Whether each user has any vectors, per corpus version
+        self._user_has_vectors = TTLCache(
+            maxsize=settings.search_cache_size,
+            ttl=settings.search_cache_ttl_seconds
+        )
+
+    @property
+    def cross_encoder(self):
+        """Cross-encoder for re-ranking, loaded once on first access."""
+        with self._cross_encoder_lock:
+            if not self._cross_encoder_loaded:
+                self._cross_encoder = self._load_cross_encoder()
+                self._cross_encoder_loaded = True
+            return self._cross_encoder
+
+    @staticmethod
+    def _load_cross_encoder():
+        """
+        Load the configured cross-encoder for re-ranking.
+
+        With rerank_backend "onnx" the model runs on ONNX Runtime, optionally
+        from a quantized export named by rerank_onnx_file.
+
+        Returns:
+            CrossEncoder model, or None if re-ranking is disabled,
+            sentence-transformers is not installed or the model fails to load
+        """
+        if not settings.rerank_model:
+            return None
+
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            logger.warning("sentence-transformers is not installed; re-ranking disabled")
+            return None
+
+        logger.info(f"Loading re-ranking model {settings.rerank_model} ({settings.rerank_backend})")
+        try:
+            if settings.rerank_backend == "onnx":
+                # A quantized int8 export roughly halves CPU inference time
+                model_kwargs = {"file_name": settings.rerank_onnx_file} if settings.rerank_onnx_file else None
+                return CrossEncoder(
+                    settings.rerank_model,
+                    device="cpu",
+                    backend="onnx",
+                    model_kwargs=model_kwargs
+                )
+            return CrossEncoder(settings.rerank_model, device="cpu")
+        except Exception as e:
+            # Searches still work without re-ranking; don't retry on every request
+            logger.error(f"Error loading re-ranking model: {str(e)}; re-ranking disabled")
+            return None
+
+    def bump_corpus_version(self) -> None:
+        """Mark the indexed document set as changed."""
+        self.corpus_version += 1
 
     def semantic_search(
         self,
         query: str,
         db: Session,
         top_k: int = 5,
-        user_id: str = "default_user"
+        user_id: str = "default_user",
+        query_embedding: Optional[np.ndarray] = None,
+        rerank: bool = True
     ) -> List[Dict[str, Any]]:
         """
         Perform semantic search using vector similarity.
 
+        Results are cached per corpus version: an identical query is
+        answered without embedding it, and a query whose embedding is
+        within settings.search_cache_threshold of a recent one reuses
+        that query's results.
+
         Args:
             query: Search query text
             db: Database session
             top_k: Number of results to return
             user_id: User ID for filtering
+            query_embedding: Precomputed embedding of the query, if available
+            rerank: Whether to re-rank a wider candidate pool with the
+                cross-encoder or MMR, when either is configured
 
         Returns:
             List of search results with relevance scores
         """
-        # Generate query embedding
         logger.info(f"Searching for: {query}")
-        query_embedding = self.embedder.generate_embedding(query)
+        rerank = rerank and self.can_rerank
+
+        # Stale entries become unreachable once the corpus version changes
+        cache_namespace = json.dumps([top_k, user_id, rerank, self.corpus_version])
+        cached = self.query_cache.get((query, cache_namespace))
+        if cached is None and not rerank and self.can_rerank:
+            # Re-ranked results are at least as good, so they also serve
+            # requests that skip re-ranking (the streaming RAG path)
+            cached = self.query_cache.get(
+                (query, json.dumps([top_k, user_id, True, self.corpus_version]))
+            )
+        if cached is not None:
+            logger.info("Returning cached search results")
+            return list(cached)
+
+        # Generate query embedding
+        if query_embedding is None:
+            query_embedding = self.embedder.generate_embedding(query)
+
+        cached = self.semantic_cache.get(query_embedding, cache_namespace)
+        if cached is not None:
+            logger.info("Returning semantically cached search results")
+            self.query_cache.set((query, cache_namespace), cached)
+            return list(cached)
+
+        # Over-fetch candidates when a re-ranker will pick the final top_k
+        n_candidates = top_k * settings.rerank_candidate_multiplier if rerank else top_k
+
+        ids, distances, embeddings = self._search_vectors(
+            query_embedding, n_candidates, user_id, include_embeddings=self._uses_mmr(rerank)
+        )
+        results = self._build_results(db, ids, distances)[0]
+
+        if rerank:
+            results = self.rerank_results(
+                query, results, self._result_embeddings(results, ids[0], embeddings[0])
+            )[:top_k]
+
+        self.query_cache.set((query, cache_namespace), results)
+        self.semantic_cache.set(query_embedding, results, cache_namespace)
+
+        logger.info(f"Found {len(results)} results")
+        return list(results)
+
+    def semantic_search_batch(
+        self,
+        queries: List[str],
+        db: Session,
+        top_k: int = 5,
+        user_id: str = "default_user",
+        rerank: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Perform semantic search for several queries at once.
+
+        Uncached queries are embedded in one batch, searched with one
+        vector store call and resolved with one database query.
+
+        Args:
+            queries: Search query texts
+            db: Database session
+            top_k: Number of results to return per query
+            user_id: User ID for filtering
+            rerank: Whether to re-rank a wider candidate pool with the
+                cross-encoder or MMR, when either is configured
+
+        Returns:
+            List of search results per query, in input order
+        """
+        logger.info(f"Searching for {len(queries)} queries")
+        rerank = rerank and self.can_rerank
+        cache_namespace = json.dumps([top_k, user_id, rerank, self.corpus_version])
+
+        results_per_query: List[Optional[List[Dict[str, Any]]]] = [
+            self.query_cache.get((query, cache_namespace)) for query in queries
+        ]
+        pending = [i for i, results in enumerate(results_per_query) if results is None]
+
+        if pending:
+            embeddings = self.embedder.generate_embeddings_batch([queries[i] for i in pending])
+
+            # Positions in ``pending`` that the semantic cache can't answer
+            misses = []
+            for position, (i, embedding) in enumerate(zip(pending, embeddings)):
+                results_per_query[i] = self.semantic_cache.get(embedding, cache_namespace)
+                if results_per_query[i] is None:
+                    misses.append(position)
+                else:
+                    self.query_cache.set((queries[i], cache_namespace), results_per_query[i])
+
+            if misses:
+                miss_embeddings = embeddings[misses]
+                n_candidates = top_k * settings.rerank_candidate_multiplier if rerank else top_k
+                ids, distances, hit_embeddings = self._search_vectors(
+                    miss_embeddings, n_candidates, user_id, include_embeddings=self._uses_mmr(rerank)
+                )
+
+                for i, embedding, results, query_ids, query_hit_embeddings in zip(
+                    (pending[position] for position in misses),
+                    miss_embeddings,
+                    self._build_results(db, ids, distances),
+                    ids,
+                    hit_embeddings
+                ):
+                    if rerank:
+                        results = self.rerank_results(
+                            queries[i],
+                            results,
+                            self._result_embeddings(results, query_ids, query_hit_embeddings)
+                        )[:top_k]
+                    self.query_cache.set((queries[i], cache_namespace), results)
+                    self.semantic_cache.set(embedding, results, cache_namespace)
+                    results_per_query[i] = results
+
+        return [list(results) for results in results_per_query]
+
+    def _search_vectors(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        user_id: str,
+        include_embeddings: bool = False
+    ) -> Tuple[List[List[str]], List[List[float]], List[Optional[np.ndarray]]]:
+        """
+        Query the vector store, filtered by user.
+
+        Users without any vectors of their own are searched without the
+        filter. That is decided with a cached metadata lookup, so the
+        filtered similarity search never has to come back empty and be
+        repeated.
+
+        Args:
+            query_embeddings: 1-D query vector or array of shape (n, dimensions)
+            n_results: Number of results per query
+            user_id: User ID for filtering
+            include_embeddings: Whether to fetch the hit vectors as well
+
+        Returns:
+            Tuple of (chunk ids per query, distances per query, hit vectors
+            per query or None each when not requested)
+        """
+        query_embeddings = np.atleast_2d(query_embeddings)
+        filter_metadata = {"user_key": user_key(user_id)}
+
+        key = (user_id, self.corpus_version)
+        has_vectors = self._user_has_vectors.get(key)
+        if has_vectors is None:
+            has_vectors = self.vector_store.has_embeddings(filter_metadata)
+            self._user_has_vectors.set(key, has_vectors)
+
+        if not has_vectors:
+            logger.warning(f"No vectors for user {user_id}, searching without filter")
+            filter_metadata = None
 
-        # Search vector database (try with filter first)
         vector_results = self.vector_store.search(
-            query_embedding=query_embedding,
-            n_results=top_k,
-            filter_metadata={"user_id": user_id}
+            query_embedding=query_embeddings,
+            n_results=n_results,
+            filter_metadata=filter_metadata,
+            include_embeddings=include_embeddings
         )
+        ids = vector_results["ids"] or [[] for _ in range(len(query_embeddings))]
+        distances = vector_results["distances"] or [[] for _ in range(len(query_embeddings))]
+        embeddings = vector_results.get("embeddings")
+        if embeddings is None:
+            embeddings = [None] * len(ids)
+        return ids, distances, embeddings
 
-        # If no results with filter, try without filter
-        if not vector_results["ids"] or len(vector_results["ids"][0]) == 0:
-            logger.warning(f"No results found with user_id filter, searching without filter")
-            vector_results = self.vector_store.search(
-                query_embedding=query_embedding,
-                n_results=top_k,
-                filter_metadata=None
-            )
+    def _build_results(
+        self,
+        db: Session,
+        ids: List[List[str]],
+        distances: List[List[float]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Turn vector hits into search results using one database query.
 
-        # Process results
-        results = []
-        if vector_results["ids"] and len(vector_results["ids"][0]) > 0:
-            chunk_ids = vector_results["ids"][0]
-            distances = vector_results["distances"][0]
-            documents = vector_results["documents"][0]
-            metadatas = vector_results["metadatas"][0]
-
-            for i, chunk_id in enumerate(chunk_ids):
-                # Fetch chunk and document from database
-                chunk = db.query(ContentChunk).filter(ContentChunk.id == chunk_id).first()
+        Args:
+            db: Database session
+            ids: Chunk ids per query, in ranking order
+            distances: Distances per query, aligned with ``ids``
+
+        Returns:
+            List of search results per query
+        """
+        # Fetch all chunks with their documents in one query
+        all_ids = {chunk_id for chunk_ids in ids for chunk_id in chunk_ids}
+        chunks_by_id = {}
+        if all_ids:
+            chunks = db.query(ContentChunk).options(
+                joinedload(ContentChunk.document)
+            ).filter(ContentChunk.id.in_(all_ids)).all()
+            chunks_by_id = {chunk.id: chunk for chunk in chunks}
+
+        # Built once per chunk, even if several queries hit it
+        metadata_by_id: Dict[str, Dict[str, Any]] = {}
+
+        results_per_query = []
+        for chunk_ids, query_distances in zip(ids, distances):
+            # The collection uses cosine space and vectors are unit length,
+            # so similarity is 1 - distance (-1 to 1, higher is better);
+            # rounded to 4 decimals so API scores stay stable
+            similarity_scores = np.round(
+                1.0 - np.asarray(query_distances, dtype=np.float64), 4
+            ).tolist()
+
+            # Walk the hits in ranking order
+            results = []
+            for chunk_id, similarity_score in zip(chunk_ids, similarity_scores):
+                chunk = chunks_by_id.get(chunk_id)
                 if not chunk:
                     continue
 
-                document = db.query(Document).filter(Document.id == chunk.document_id).first()
+                document = chunk.document
                 if not document:
                     continue
 
-                # Convert distance to similarity score (0-1, higher is better)
-                # ChromaDB returns L2 distance, convert to similarity
-                similarity_score = 1 / (1 + distances[i])
+                metadata = metadata_by_id.get(chunk_id)
+                if metadata is None:
+                    metadata = dict(chunk.chunk_metadata) if chunk.chunk_metadata else {}
+                    metadata["chunk_index"] = chunk.chunk_index
+                    metadata["created_at"] = chunk.created_at.isoformat()
+                    metadata_by_id[chunk_id] = metadata
 
                 result = {
                     "chunk_id": chunk_id,
@@ -83,17 +354,13 @@ class SearchService:
                     "document_title": document.title,
                     "content": chunk.content,
                     "page_number": chunk.page_number,
-                    "relevance_score": round(similarity_score, 4),
-                    "metadata": {
-                        **chunk.chunk_metadata,
-                        "chunk_index": chunk.chunk_index,
-                        "created_at": chunk.created_at.isoformat()
-                    }
+                    "relevance_score": similarity_score,
+                    "metadata": metadata
                 }
                 results.append(result)
+            results_per_query.append(results)
 
-        logger.info(f"Found {len(results)} results")
-        return results
+        return results_per_query
 
     def get_document_chunks(self, document_id: str, db: Session) -> List[ContentChunk]:
         """
@@ -112,20 +379,122 @@ class SearchService:
 
         return chunks
 
-    def rerank_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @property
+    def can_rerank(self) -> bool:
+        """Whether a cross-encoder or MMR is configured."""
+        return self.cross_encoder is not None or settings.mmr_lambda is not None
+
+    def _uses_mmr(self, rerank: bool) -> bool:
+        """
+        Whether re-ranking will fall back to MMR, the only step that needs hit vectors.
+
+        Args:
+            rerank: Whether the search re-ranks at all
+
+        Returns:
+            True if the hit vectors should be fetched
+        """
+        return rerank and self.cross_encoder is None and settings.mmr_lambda is not None
+
+    @staticmethod
+    def _result_embeddings(
+        results: List[Dict[str, Any]],
+        chunk_ids: List[str],
+        embeddings: Optional[np.ndarray]
+    ) -> Optional[np.ndarray]:
         """
-        Re-rank search results (placeholder for future enhancement).
+        Pick the vectors of the hits that made it into the results.
 
         Args:
+            results: Search results
+            chunk_ids: Chunk ids of every vector hit
+            embeddings: Vectors of every vector hit, aligned with ``chunk_ids``
+
+        Returns:
+            Array of shape (len(results), dimensions), or None without vectors
+        """
+        if embeddings is None:
+            return None
+        row_by_id = {chunk_id: row for row, chunk_id in enumerate(chunk_ids)}
+        return np.asarray(embeddings, dtype=np.float32)[
+            [row_by_id[result["chunk_id"]] for result in results]
+        ]
+
+    def rerank_results(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        embeddings: Optional[np.ndarray] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Re-rank search results with the cross-encoder, or diversify them with MMR.
+
+        Each result keeps its vector relevance_score; only the order changes.
+        Results are returned unchanged when neither is configured.
+
+        Args:
+            query: Search query text
             results: Initial search results
+            embeddings: Vectors of the results, needed for MMR
 
         Returns:
             Re-ranked results
         """
-        # For MVP, just return as-is
-        # Future: implement cross-encoder re-ranking, diversity, etc.
+        if len(results) < 2:
+            return results
+
+        if self.cross_encoder is not None:
+            scores = self.cross_encoder.predict(
+                [(query, result["content"]) for result in results],
+                batch_size=32
+            )
+            order = np.argsort(-np.asarray(scores))
+            return [results[i] for i in order]
+
+        if settings.mmr_lambda is not None and embeddings is not None:
+            order = self._mmr_order(
+                np.array([result["relevance_score"] for result in results], dtype=np.float32),
+                embeddings,
+                settings.mmr_lambda
+            )
+            return [results[i] for i in order]
+
         return results
 
+    @staticmethod
+    def _mmr_order(relevance: np.ndarray, embeddings: np.ndarray, lambda_: float) -> List[int]:
+        """
+        Order results by Maximal Marginal Relevance.
+
+        Each pick maximizes lambda * relevance - (1 - lambda) * (highest
+        similarity to anything already picked), which pushes near-duplicate
+        chunks down the list.
+
+        Args:
+            relevance: Relevance score of each result
+            embeddings: Result vectors, shape (n, dimensions)
+            lambda_: Trade-off between relevance (1.0) and diversity (0.0)
+
+        Returns:
+            Result indices in MMR order
+        """
+        vectors = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+        # All pairwise similarities in one matrix product
+        similarity = vectors @ vectors.T
+
+        n = len(relevance)
+        redundancy = np.zeros(n, dtype=np.float32)
+        picked = np.zeros(n, dtype=bool)
+        order = []
+        for _ in range(n):
+            scores = lambda_ * relevance - (1.0 - lambda_) * redundancy
+            scores[picked] = -np.inf
+            best = int(np.argmax(scores))
+            order.append(best)
+            picked[best] = True
+            redundancy = similarity[best] if len(order) == 1 else np.maximum(redundancy, similarity[best])
+        return order
+
 
 # Singleton instance
 search_service = SearchService()
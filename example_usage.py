@@ -4,31 +4,51 @@ Example usage of the Second Brain API.
 This demonstrates how to integrate the API into your own applications.
 """
 
-import requests
+import asyncio
+import httpx
 from pathlib import Path
 from typing import List, Dict, Any
 
 
 class SecondBrainClient:
-    """Client for interacting with the Second Brain API."""
+    """Async client for interacting with the Second Brain API."""
 
     def __init__(self, base_url: str = "http://localhost:8000"):
         """
         Initialize the client.
 
+        One connection pool is shared by every call; use the client as an
+        async context manager, or call aclose() when done.
+
         Args:
             base_url: Base URL of the API server
         """
         self.base_url = base_url
         self.api_base = f"{base_url}/api"
+        self._client = httpx.AsyncClient(
+            base_url=self.api_base,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32),
+            timeout=httpx.Timeout(120.0, connect=5.0)
+        )
+
+    async def __aenter__(self) -> "SecondBrainClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
 
-    def health_check(self) -> Dict[str, Any]:
+    async def aclose(self) -> None:
+        """Close the underlying connections."""
+        await self._client.aclose()
+
+    async def health_check(self) -> Dict[str, Any]:
         """Check if the API is healthy."""
-        response = requests.get(f"{self.api_base}/health")
+        response = await self._client.get("/health")
         response.raise_for_status()
         return response.json()
 
-    def upload_pdf(self, file_path: str) -> Dict[str, Any]:
+    async def upload_pdf(self, file_path: str) -> Dict[str, Any]:
         """
         Upload a PDF file.
 
@@ -40,11 +60,11 @@ class SecondBrainClient:
         """
         with open(file_path, "rb") as f:
             files = {"file": (Path(file_path).name, f, "application/pdf")}
-            response = requests.post(f"{self.api_base}/upload", files=files)
+            response = await self._client.post("/upload", files=files)
             response.raise_for_status()
             return response.json()
 
-    def search(self, query: str, top_k: int = 5, user_id: str = "default_user") -> Dict[str, Any]:
+    async def search(self, query: str, top_k: int = 5, user_id: str = "default_user") -> Dict[str, Any]:
         """
         Search documents.
 
@@ -57,11 +77,11 @@ class SecondBrainClient:
             Search results
         """
         payload = {"query": query, "top_k": top_k, "user_id": user_id}
-        response = requests.post(f"{self.api_base}/query", json=payload)
+        response = await self._client.post("/query", json=payload)
         response.raise_for_status()
         return response.json()
 
-    def list_documents(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+    async def list_documents(self, skip: int = 0, limit: int = 100) -> Dict[str, Any]:
         """
         List all documents.
 
@@ -72,11 +92,11 @@ class SecondBrainClient:
         Returns:
             List of documents
         """
-        response = requests.get(f"{self.api_base}/documents", params={"skip": skip, "limit": limit})
+        response = await self._client.get("/documents", params={"skip": skip, "limit": limit})
         response.raise_for_status()
         return response.json()
 
-    def get_document(self, document_id: str) -> Dict[str, Any]:
+    async def get_document(self, document_id: str) -> Dict[str, Any]:
         """
         Get a specific document.
 
@@ -86,38 +106,48 @@ class SecondBrainClient:
         Returns:
             Document details
         """
-        response = requests.get(f"{self.api_base}/documents/{document_id}")
+        response = await self._client.get(f"/documents/{document_id}")
         response.raise_for_status()
         return response.json()
 
-    def delete_document(self, document_id: str) -> None:
+    async def delete_document(self, document_id: str) -> None:
         """
         Delete a document.
 
         Args:
             document_id: Document ID
         """
-        response = requests.delete(f"{self.api_base}/documents/{document_id}")
+        response = await self._client.delete(f"/documents/{document_id}")
         response.raise_for_status()
 
 
-def example_workflow():
+async def example_workflow():
     """Example workflow demonstrating API usage."""
     # Initialize client
-    client = SecondBrainClient()
+    async with SecondBrainClient() as client:
+        await run_workflow(client)
+
 
+async def run_workflow(client: SecondBrainClient):
+    """Run the example steps with a shared client."""
     print("🧠 Second Brain Client - Example Workflow\n")
 
+    # Health, listing and search don't depend on each other; send them together
+    health, docs, results = await asyncio.gather(
+        client.health_check(),
+        client.list_documents(limit=5),
+        client.search("machine learning", top_k=3)
+    )
+
     # 1. Check health
     print("1️⃣ Checking API health...")
-    health = client.health_check()
     print(f"   ✅ Status: {health['status']}")
     print(f"   📊 Documents: {health['database_documents']}")
     print()
 
     # 2. Upload a document (uncomment and provide a path)
     # print("2️⃣ Uploading a PDF...")
-    # result = client.upload_pdf("/path/to/your/document.pdf")
+    # result = await client.upload_pdf("/path/to/your/document.pdf")
     # print(f"   ✅ Uploaded: {result['title']}")
     # print(f"   📄 Pages: {result['page_count']}")
     # print(f"   🧩 Chunks: {result['chunks_created']}")
@@ -126,7 +156,6 @@ def example_workflow():
 
     # 3. List documents
     print("3️⃣ Listing documents...")
-    docs = client.list_documents(limit=5)
     print(f"   📚 Total documents: {docs['total']}")
     for doc in docs['documents']:
         print(f"   - {doc['title']} ({doc['page_count']} pages)")
@@ -134,7 +163,6 @@ def example_workflow():
 
     # 4. Search
     print("4️⃣ Searching for 'machine learning'...")
-    results = client.search("machine learning", top_k=3)
     print(f"   🔍 Found {results['total_results']} results in {results['processing_time_ms']:.2f}ms")
     for i, result in enumerate(results['results'], 1):
         print(f"\n   Result {i}:")
@@ -146,7 +174,7 @@ def example_workflow():
 
     # 5. Get specific document (uncomment if you uploaded one)
     # print("5️⃣ Getting document details...")
-    # doc = client.get_document(document_id)
+    # doc = await client.get_document(document_id)
     # print(f"   📄 Title: {doc['title']}")
     # print(f"   📊 Size: {doc['file_size']} bytes")
     # print(f"   📅 Created: {doc['created_at']}")
@@ -157,8 +185,8 @@ def example_workflow():
 
 if __name__ == "__main__":
     try:
-        example_workflow()
-    except requests.exceptions.ConnectionError:
+        asyncio.run(example_workflow())
+    except httpx.ConnectError:
         print("❌ Error: Cannot connect to API server.")
         print("   Make sure the server is running: python -m app.main")
     except Exception as e:
@@ -3,15 +3,24 @@
 Quick script to delete and re-upload a document to fix missing embeddings.
 """
 
-import requests
 import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from test_api import create_session
 
 BASE_URL = "http://localhost:8000"
 
+# Concurrent deletes when fixing all documents
+MAX_DELETE_WORKERS = 8
+
+# Shared by every request so each call reuses a pooled connection
+SESSION = create_session()
+
 def delete_document(doc_id):
     """Delete a document."""
     print(f"🗑️  Deleting document {doc_id}...")
-    response = requests.delete(f"{BASE_URL}/api/documents/{doc_id}")
+    response = SESSION.delete(f"{BASE_URL}/api/documents/{doc_id}")
 
     if response.status_code == 204:
         print("✅ Document deleted successfully")
@@ -25,9 +34,14 @@ def upload_document(file_path):
     """Upload a document."""
     print(f"📤 Uploading {file_path}...")
 
+    # Stream the file from disk instead of building the whole body in memory
     with open(file_path, 'rb') as f:
-        files = {'file': f}
-        response = requests.post(f"{BASE_URL}/api/upload", files=files)
+        body = MultipartEncoder(fields={'file': (Path(file_path).name, f, 'application/pdf')})
+        response = SESSION.post(
+            f"{BASE_URL}/api/upload",
+            data=body,
+            headers={'Content-Type': body.content_type}
+        )
 
     if response.status_code == 201:
         data = response.json()
@@ -43,7 +57,7 @@ def upload_document(file_path):
 
 def check_health():
     """Check system health."""
-    response = requests.get(f"{BASE_URL}/api/health")
+    response = SESSION.get(f"{BASE_URL}/api/health")
     if response.status_code == 200:
         data = response.json()
         print(f"\n📊 System Status:")
@@ -71,7 +85,7 @@ def main():
         doc_id = sys.argv[2] if len(sys.argv) > 2 else None
     else:
         # List documents
-        response = requests.get(f"{BASE_URL}/api/documents")
+        response = SESSION.get(f"{BASE_URL}/api/documents")
         if response.status_code == 200:
             docs = response.json()['documents']
             if docs:
@@ -86,9 +100,19 @@ def main():
                     print("  Fixing All Documents")
                     print("="*60)
 
-                    for doc in docs:
-                        print(f"\nProcessing: {doc['title']}")
-                        delete_document(doc['id'])
+                    # Deletes are independent, so overlap their round-trips
+                    failed = []
+                    with ThreadPoolExecutor(max_workers=MAX_DELETE_WORKERS) as executor:
+                        futures = {executor.submit(delete_document, doc['id']): doc for doc in docs}
+                        for future in as_completed(futures):
+                            if not future.result():
+                                failed.append(futures[future])
+
+                    if failed:
+                        print(f"\n❌ {len(failed)} document(s) could not be deleted:")
+                        for doc in failed:
+                            print(f"  - {doc['title']} (ID: {doc['id'][:8]}...)")
+                        return
 
                     print("\nAll documents deleted. Now re-upload your PDFs:")
                     print("  python test_api.py")
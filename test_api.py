@@ -7,10 +7,30 @@ Run this after starting the server to verify everything works.
 import requests
 import json
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from requests_toolbelt.multipart.encoder import MultipartEncoder
+from urllib3.util.retry import Retry
 
 BASE_URL = "http://localhost:8000"
 
 
+def create_session() -> requests.Session:
+    """Create a session that keeps connections to the server alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.1)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared by every request so each call reuses a pooled connection
+SESSION = create_session()
+
+
 def print_section(title):
     """Print a formatted section header."""
     print("\n" + "=" * 60)
@@ -21,7 +41,7 @@ def print_section(title):
 def test_health():
     """Test health check endpoint."""
     print_section("Health Check")
-    response = requests.get(f"{BASE_URL}/api/health")
+    response = SESSION.get(f"{BASE_URL}/api/health")
     print(f"Status: {response.status_code}")
     print(f"Response: {json.dumps(response.json(), indent=2)}")
     return response.status_code == 200
@@ -35,9 +55,14 @@ def test_upload(pdf_path):
         print(f"❌ File not found: {pdf_path}")
         return None
 
+    # Stream the file from disk instead of building the whole body in memory
     with open(pdf_path, "rb") as f:
-        files = {"file": (Path(pdf_path).name, f, "application/pdf")}
-        response = requests.post(f"{BASE_URL}/api/upload", files=files)
+        body = MultipartEncoder(fields={"file": (Path(pdf_path).name, f, "application/pdf")})
+        response = SESSION.post(
+            f"{BASE_URL}/api/upload",
+            data=body,
+            headers={"Content-Type": body.content_type}
+        )
 
     print(f"Status: {response.status_code}")
     if response.status_code == 201:
@@ -56,7 +81,7 @@ def test_upload(pdf_path):
 def test_list_documents():
     """Test listing documents."""
     print_section("List Documents")
-    response = requests.get(f"{BASE_URL}/api/documents")
+    response = SESSION.get(f"{BASE_URL}/api/documents")
     print(f"Status: {response.status_code}")
 
     if response.status_code == 200:
@@ -74,7 +99,7 @@ def test_query(query_text, top_k=3):
 
     payload = {"query": query_text, "top_k": top_k, "user_id": "default_user"}
 
-    response = requests.post(
+    response = SESSION.post(
         f"{BASE_URL}/api/query",
         json=payload,
         headers={"Content-Type": "application/json"},
@@ -102,7 +127,7 @@ def test_query(query_text, top_k=3):
 def test_get_document(document_id):
     """Test getting document details."""
     print_section(f"Get Document Details")
-    response = requests.get(f"{BASE_URL}/api/documents/{document_id}")
+    response = SESSION.get(f"{BASE_URL}/api/documents/{document_id}")
     print(f"Status: {response.status_code}")
 
     if response.status_code == 200:
@@ -4,13 +4,49 @@ Test script for RAG (Retrieval-Augmented Generation) functionality.
 Run this after starting the server to test Q&A capabilities.
 """
 
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 import sys
 from pathlib import Path
 
 BASE_URL = "http://localhost:8000"
 
+# Server-sent event framing
+SSE_PREFIX = b"data: "
+SSE_SEPARATOR = b"\n\n"
+
+
+def create_client() -> httpx.AsyncClient:
+    """Create the HTTP client shared by every test, reusing connections."""
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32),
+        timeout=httpx.Timeout(120.0, connect=5.0)
+    )
+
+
+async def iter_sse_events(response: httpx.Response):
+    """
+    Parse server-sent events straight from the response bytes.
+
+    Args:
+        response: Streaming response
+
+    Yields:
+        Decoded JSON payload of each data event
+    """
+    buffer = bytearray()
+    async for chunk in response.aiter_bytes(chunk_size=4096):
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(SSE_SEPARATOR, start)) != -1:
+            if buffer.startswith(SSE_PREFIX, start):
+                yield orjson.loads(memoryview(buffer)[start + len(SSE_PREFIX):end])
+            start = end + len(SSE_SEPARATOR)
+        del buffer[:start]
+
 
 def print_section(title):
     """Print a formatted section header."""
@@ -19,22 +55,18 @@ def print_section(title):
     print("=" * 70)
 
 
-def test_simple_question(question: str):
+async def test_simple_question(client: httpx.AsyncClient, question: str):
     """Test a simple question without conversation history."""
-    print_section(f"Question: {question}")
-
     payload = {
         "question": question,
         "top_k": 5,
         "include_sources": True
     }
 
-    response = requests.post(
-        f"{BASE_URL}/api/rag/ask",
-        json=payload,
-        headers={"Content-Type": "application/json"}
-    )
+    response = await client.post("/api/rag/ask", json=payload)
 
+    # Print only once the answer is in, so concurrent questions don't interleave
+    print_section(f"Question: {question}")
     if response.status_code == 200:
         data = response.json()
         print(f"\n📝 Answer:\n{data['answer']}\n")
@@ -54,7 +86,7 @@ def test_simple_question(question: str):
         print(f"   {response.text}")
 
 
-def test_conversation():
+async def test_conversation(client: httpx.AsyncClient):
     """Test conversation with history."""
     print_section("Conversation Test")
 
@@ -74,11 +106,8 @@ def test_conversation():
             "top_k": 5
         }
 
-        response = requests.post(
-            f"{BASE_URL}/api/rag/conversation",
-            json=payload,
-            headers={"Content-Type": "application/json"}
-        )
+        # Each turn depends on the previous answer, so turns stay sequential
+        response = await client.post("/api/rag/conversation", json=payload)
 
         if response.status_code == 200:
             data = response.json()
@@ -93,7 +122,7 @@ def test_conversation():
             break
 
 
-def test_streaming_question(question: str):
+async def test_streaming_question(client: httpx.AsyncClient, question: str):
     """Test streaming response."""
     print_section(f"Streaming Question: {question}")
 
@@ -102,48 +131,42 @@ def test_streaming_question(question: str):
         "top_k": 5
     }
 
-    print("\n🌊 Streaming answer:\n")
-
-    response = requests.post(
-        f"{BASE_URL}/api/rag/ask/stream",
-        json=payload,
-        headers={"Content-Type": "application/json"},
-        stream=True
-    )
+    print("\n🌊 Streaming answer:\n", flush=True)
 
-    if response.status_code == 200:
-        sources_received = False
-        answer_chunks = []
-
-        for line in response.iter_lines():
-            if line:
-                line_str = line.decode('utf-8')
-                if line_str.startswith('data: '):
-                    data = json.loads(line_str[6:])
-
-                    if data['type'] == 'sources':
-                        if not sources_received:
-                            print(f"📚 Retrieved {len(data['data'])} sources\n")
-                            sources_received = True
-
-                    elif data['type'] == 'answer':
-                        print(data['data'], end='', flush=True)
-                        answer_chunks.append(data['data'])
-
-                    elif data['type'] == 'done':
-                        print("\n\n✅ Streaming complete")
-
-        print(f"\n📊 Total answer length: {len(''.join(answer_chunks))} characters")
-    else:
-        print(f"❌ Error: {response.status_code}")
+    async with client.stream("POST", "/api/rag/ask/stream", json=payload) as response:
+        if response.status_code == 200:
+            sources_received = False
+            answer_chunks = []
+            out = sys.stdout.buffer
+
+            async for data in iter_sse_events(response):
+                if data['type'] == 'sources':
+                    if not sources_received:
+                        print(f"📚 Retrieved {len(data['data'])} sources\n", flush=True)
+                        sources_received = True
+
+                elif data['type'] == 'answer':
+                    # Encode each token once; it is both shown and kept as bytes
+                    token = data['data'].encode()
+                    out.write(token)
+                    out.flush()
+                    answer_chunks.append(token)
+
+                elif data['type'] == 'done':
+                    print("\n\n✅ Streaming complete")
+
+            answer = b"".join(answer_chunks).decode()
+            print(f"\n📊 Total answer length: {len(answer)} characters")
+        else:
+            print(f"❌ Error: {response.status_code}")
 
 
-def test_document_summary():
+async def test_document_summary(client: httpx.AsyncClient):
     """Test document summarization."""
     print_section("Document Summary Test")
 
     # First, get list of documents
-    response = requests.get(f"{BASE_URL}/api/documents")
+    response = await client.get("/api/documents")
 
     if response.status_code == 200:
         data = response.json()
@@ -155,11 +178,7 @@ def test_document_summary():
             print(f"\n📄 Summarizing: {doc_title}")
 
             summary_payload = {"document_id": doc_id}
-            summary_response = requests.post(
-                f"{BASE_URL}/api/rag/summarize",
-                json=summary_payload,
-                headers={"Content-Type": "application/json"}
-            )
+            summary_response = await client.post("/api/rag/summarize", json=summary_payload)
 
             if summary_response.status_code == 200:
                 summary_data = summary_response.json()
@@ -174,28 +193,34 @@ def test_document_summary():
         print(f"❌ Error listing documents: {response.status_code}")
 
 
-def main():
+async def main():
     """Run all RAG tests."""
+    async with create_client() as client:
+        await run_tests(client)
+
+
+async def run_tests(client: httpx.AsyncClient):
+    """Run all RAG tests with a shared client."""
     print("\n" + "🧠" * 35)
     print("Second Brain - RAG Testing Suite")
     print("🧠" * 35)
 
     # Check if server is running
     try:
-        response = requests.get(f"{BASE_URL}/")
+        response = await client.get("/")
         if response.status_code != 200:
             print("\n❌ Server is not responding correctly.")
             print("   Start it with: python -m app.main")
             return
-    except requests.exceptions.ConnectionError:
-        print("\n❌ Cannot connect to server at {BASE_URL}")
+    except httpx.ConnectError:
+        print(f"\n❌ Cannot connect to server at {BASE_URL}")
         print("   Start it with: python -m app.main")
         return
 
     print("\n✅ Server is running!")
 
     # Check if we have documents
-    docs_response = requests.get(f"{BASE_URL}/api/documents")
+    docs_response = await client.get("/api/documents")
     if docs_response.status_code == 200:
         doc_count = docs_response.json()['total']
         print(f"📚 Found {doc_count} documents in database")
@@ -221,14 +246,14 @@ def main():
     use_default = input("\nUse default questions? (y/n): ").strip().lower()
 
     if use_default == 'y':
-        for q in questions:
-            test_simple_question(q)
+        # Independent questions are asked concurrently
+        await asyncio.gather(*(test_simple_question(client, q) for q in questions))
     else:
         while True:
             q = input("\nEnter a question (or 'skip' to continue): ").strip()
             if q.lower() in ['skip', 's', '']:
                 break
-            test_simple_question(q)
+            await test_simple_question(client, q)
 
     # Test 2: Streaming
     print("\n" + "─" * 70)
@@ -238,7 +263,7 @@ def main():
     test_streaming = input("\nTest streaming response? (y/n): ").strip().lower()
     if test_streaming == 'y':
         question = input("Enter question: ").strip() or "Explain the main concept in detail"
-        test_streaming_question(question)
+        await test_streaming_question(client, question)
 
     # Test 3: Conversation
     print("\n" + "─" * 70)
@@ -247,7 +272,7 @@ def main():
 
     test_conv = input("\nTest conversation mode? (y/n): ").strip().lower()
     if test_conv == 'y':
-        test_conversation()
+        await test_conversation(client)
 
     # Test 4: Document Summary
     print("\n" + "─" * 70)
@@ -256,7 +281,7 @@ def main():
 
     test_summ = input("\nTest document summarization? (y/n): ").strip().lower()
     if test_summ == 'y':
-        test_document_summary()
+        await test_document_summary(client)
 
     print("\n" + "=" * 70)
     print("✅ RAG Testing Complete!")
@@ -265,7 +290,7 @@ def main():
 
 if __name__ == "__main__":
     try:
-        main()
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\n\n👋 Testing interrupted. Bye!")
     except Exception as e: